@@ -0,0 +1,211 @@
+"""
+مقایسه مقیاس‌پذیری نسخه‌های sync و async ویوهای مسابقه زیر uvicorn.
+
+آماده‌سازی (سوال فعال و کاربران تست؛ توکن‌ها در فایل نوشته می‌شوند):
+    python benchmarks/quiz_endpoints.py prepare --users 500 --tokens tokens.txt
+
+اجرای سرور (یک پروسه تا مقایسه منصفانه باشد):
+    uvicorn gerhgosha.asgi:application --workers 1 --no-access-log
+
+اجرای بنچمارک:
+    python benchmarks/quiz_endpoints.py run --url http://127.0.0.1:8000 --tokens tokens.txt
+
+برای بنچمارک submit-response نرخ‌های submit_response.* در DEFAULT_THROTTLE_RATES
+باید بالا برده شوند، وگرنه بیشتر درخواست‌ها 429 می‌گیرند (در خروجی دیده می‌شود).
+کلاینت فقط از کتابخانه استاندارد استفاده می‌کند (asyncio با اتصال keep-alive).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+ENDPOINTS = {
+    'active-question': ('GET', '/api/active-question/', '/api/async/active-question/'),
+    'correct-responders': ('GET', '/api/correct-responders/?limit=100', '/api/async/correct-responders/?limit=100'),
+    'submit-response': ('POST', '/api/submit-response/', '/api/async/submit-response/'),
+}
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+class Connection:
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers, body=b''):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}", f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+        await self.writer.drain()
+        status, keep_alive = await read_response(self.reader)
+        if not keep_alive:
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def worker(url, method, path, tokens, choice_id, deadline, latencies, statuses, offset):
+    connection = Connection(url.hostname, url.port or 80)
+    index = offset
+    try:
+        while time.perf_counter() < deadline:
+            headers = {}
+            body = b''
+            if tokens:
+                headers['Authorization'] = f"Token {tokens[index % len(tokens)]}"
+                index += 1
+            if method == 'POST':
+                headers['Content-Type'] = 'application/json'
+                body = json.dumps({'selected_choice_id': choice_id}).encode()
+            started = time.perf_counter()
+            try:
+                status = await connection.request(method, path, headers, body)
+            except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                connection.close()
+                status = 'error'
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+    finally:
+        connection.close()
+
+
+async def measure(url, method, path, concurrency, duration, tokens, choice_id):
+    latencies = []
+    statuses = Counter()
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    step = max(1, len(tokens) // concurrency) if tokens else 0
+    await asyncio.gather(*(
+        worker(url, method, path, tokens, choice_id, deadline, latencies, statuses, i * step)
+        for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(0.5),
+        'p95': percentile(0.95),
+        'p99': percentile(0.99),
+        'statuses': dict(statuses),
+    }
+
+
+def run(args):
+    url = urlsplit(args.url)
+    tokens = []
+    if args.tokens:
+        with open(args.tokens) as f:
+            tokens = [line.strip() for line in f if line.strip()]
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    print(f"{'endpoint':<20} {'mode':<6} {'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+    for name in args.endpoints.split(','):
+        method, sync_path, async_path = ENDPOINTS[name]
+        for mode, path in (('sync', sync_path), ('async', async_path)):
+            for concurrency in levels:
+                result = asyncio.run(measure(url, method, path, concurrency, args.duration, tokens, args.choice))
+                print(
+                    f"{name:<20} {mode:<6} {concurrency:>5} {result['rps']:>9.1f} {result['p50']:>8.1f} "
+                    f"{result['p95']:>8.1f} {result['p99']:>8.1f}  {result['statuses']}"
+                )
+
+
+def prepare(args):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gerhgosha.settings')
+    import django
+    django.setup()
+
+    from datetime import timedelta
+
+    from django.utils import timezone
+
+    from home.authentication import issue_token
+    from home.hashing import hash_password
+    from home.models import Choice, Question, User
+
+    question = Question.objects.active().first()
+    if question is None:
+        current = timezone.now()
+        question = Question.objects.create(
+            text='سوال بنچمارک', is_active=True,
+            expiry_date=current + timedelta(days=1), next_question=current + timedelta(days=1),
+        )
+        Choice.objects.create(question=question, text='درست', is_correct=True)
+        Choice.objects.create(question=question, text='نادرست', is_correct=False)
+
+    password = hash_password('benchmark')
+    existing = set(User.objects.filter(phone_number__startswith='0999').values_list('phone_number', flat=True))
+    User.objects.bulk_create([
+        User(phone_number=f"0999{i:07d}", password=password, first_name='bench', last_name=str(i),
+             province='تهران', gender='M' if i % 2 else 'F')
+        for i in range(args.users) if f"0999{i:07d}" not in existing
+    ])
+    users = User.objects.filter(phone_number__startswith='0999').order_by('pk')[:args.users]
+    with open(args.tokens, 'w') as f:
+        f.writelines(f"{issue_token(user)}\n" for user in users)
+
+    choice = question.choices.order_by('-is_correct').first()
+    print(f"question={question.pk} choice={choice.pk} users={len(users)} tokens={args.tokens}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    prepare_parser = subparsers.add_parser('prepare', help='ساخت سوال فعال و کاربران تست')
+    prepare_parser.add_argument('--users', type=int, default=500)
+    prepare_parser.add_argument('--tokens', default='tokens.txt')
+    prepare_parser.set_defaults(func=prepare)
+
+    run_parser = subparsers.add_parser('run', help='اجرای بنچمارک روی سرور در حال اجرا')
+    run_parser.add_argument('--url', default='http://127.0.0.1:8000')
+    run_parser.add_argument('--tokens', help='فایل توکن‌ها (خروجی prepare)')
+    run_parser.add_argument('--choice', type=int, help='آیدی گزینه برای submit-response')
+    run_parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+    run_parser.add_argument('--concurrency', default='1,10,50,100')
+    run_parser.add_argument('--duration', type=float, default=5.0, help='مدت هر مرحله (ثانیه)')
+    run_parser.set_defaults(func=run)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,15 +45,26 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework.authtoken',
     'drf_yasg',
-    'django_apscheduler',
 
 ]
 
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        # توکن‌های امضاشده بدون کوئری بررسی می‌شوند؛ توکن‌های قدیمی همچنان معتبرند
+        'home.authentication.SignedTokenAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
+    # نرخ‌های home.throttling به صورت '<throttle_scope>.<phone|ip|token>'
+    # شمارنده‌ها در کش THROTTLE_CACHE نگه داشته می‌شوند تا 429 بدون هیچ کوئری دیتابیس برگردد
+    'DEFAULT_THROTTLE_RATES': {
+        'send_otp.phone': '3/min',
+        'send_otp.ip': '30/min',
+        'login.phone': '5/min',
+        'login.ip': '60/min',
+        'submit_response.token': '10/min',
+        'submit_response.ip': '600/min',
+    },
 }
 
 
@@ -99,6 +111,39 @@ DATABASES = {
     }
 }
 
+# کش مشترک بین همه پروسه‌ها (وب، ASGI و runscheduler)؛ اشاره‌گر سوال فعال، داده آماده سوال‌ها،
+# وضعیت تیکت‌ها و کدهای تأیید در آن نگه داشته می‌شوند و باید Redis یا Memcached باشد.
+# بدون REDIS_URL کش محلی پروسه استفاده می‌شود که فقط برای توسعه با یک پروسه مناسب است (runscheduler اجرا نمی‌شود).
+# شمارنده‌های throttle در کش جداگانه 'throttle' هستند تا کلیدهای پرتعداد آن‌ها باعث حذف کلیدهای بالا نشوند.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+        'throttle': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'throttle',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'default',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        },
+        'throttle': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'throttle',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        },
+    }
+# alias کش شمارنده‌های throttle؛ نباید DatabaseCache باشد
+THROTTLE_CACHE = 'throttle'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -133,6 +178,79 @@ USE_TZ = True
 
 AUTH_USER_MODEL = 'home.User'
 
+# نحوه ثبت پاسخ‌ها: 'direct' (درج مستقیم) یا 'buffered' (درج دسته‌ای با تأخیر)
+RESPONSE_INGESTION_MODE = 'direct'
+RESPONSE_BUFFER_MAX_SIZE = 500
+RESPONSE_BUFFER_FLUSH_INTERVAL = 1.0  # ثانیه
+# سقف تلاش برای نوشتن هر آیتم صف‌های با تأخیر (پاسخ‌ها و bitmap) هنگام خطای موقت دیتابیس؛
+# فاصله تلاش‌ها تا یک دقیقه دو برابر می‌شود و پاسخ‌های نوشته‌نشده در RESPONSE_SPOOL_DIR ذخیره می‌شوند
+# (manage.py replay_responses)
+WRITE_BEHIND_MAX_ATTEMPTS = 30
+WRITE_BEHIND_CLOSE_TIMEOUT = 10  # ثانیه؛ تلاش برای تخلیه صف هنگام خاموش شدن پروسه
+RESPONSE_SPOOL_DIR = BASE_DIR / 'spool'
+RESPONSE_DEDUP_TTL = 24 * 3600  # ثانیه؛ نگهداری کلید پاسخ‌داده‌شده در کش مشترک (حالت buffered)
+
+# شِدولر فقط در دستور manage.py runscheduler اجرا می‌شود
+SCHEDULER_HEARTBEAT_INTERVAL = 5  # ثانیه
+SCHEDULER_LEASE_TIMEOUT = 30  # ثانیه
+
+# سوالات منقضی: 'archive' (انتقال پاسخ‌ها به جدول بایگانی) یا 'delete' (حذف کامل)
+QUESTION_EXPIRY_MODE = 'archive'
+ARCHIVE_CHUNK_SIZE = 1000
+
+# تعداد shardهای هر شمارنده آمار پاسخ؛ هر ثبت پاسخ فقط ردیف‌های shard کاربر خود را به‌روز می‌کند.
+# shard بیشتر یعنی رقابت کمتر روی ردیف‌های پرتکرار و در عوض ردیف بیشتر برای جمع زدن در گزارش آمار
+ANSWER_STATS_SHARDS = 8
+
+# نوشتن دسته‌ای bitmap کاربران با پاسخ درست
+BITMAP_FLUSH_MAX_SIZE = 1000
+BITMAP_FLUSH_INTERVAL = 1.0  # ثانیه
+
+# تعداد برندگان در action قرعه‌کشی پنل مدیریت
+PRIZE_DRAW_WINNERS = 10
+
+# صف ارسال پیامک (manage.py run_sms_worker)
+SMS_GATEWAY = 'home.sms.ConsoleGateway'
+SMS_BATCH_SIZE = 100
+SMS_MAX_ATTEMPTS = 5
+SMS_RETRY_BACKOFF = 5  # ثانیه؛ برای هر تلاش دو برابر می‌شود
+SMS_DEDUP_WINDOW = 60  # ثانیه
+SMS_SEND_TIMEOUT = 60  # ثانیه؛ پیام رزروشده پس از این زمان دوباره قابل برداشت است
+SMS_RETENTION = 7 * 24 * 3600  # ثانیه؛ پیام‌های ارسال‌شده یا ناموفق پس از این مدت در purge_otps حذف می‌شوند
+
+# محل نگهداری کدهای تأیید: 'home.otp.ModelOTPStore' (جدول PhoneOTP) یا 'home.otp.CacheOTPStore' (کش)
+# CacheOTPStore در چند پروسه فقط با کش مشترک (مثل Redis یا Memcached) درست کار می‌کند
+OTP_STORE = 'home.otp.ModelOTPStore'
+OTP_VERIFIED_TTL = 30 * 60  # ثانیه
+
+# توکن‌های امضاشده؛ برای چرخش کلید، کلید جدید اضافه و AUTH_TOKEN_KEY_VERSION عوض شود
+AUTH_TOKEN_KEYS = {'1': SECRET_KEY}
+AUTH_TOKEN_KEY_VERSION = '1'
+AUTH_TOKEN_TTL = 30 * 24 * 3600  # ثانیه
+AUTH_TOKEN_REVOCATION_REFRESH = 60  # ثانیه
+
+# آماده‌سازی داده سوال بعدی پیش از چرخش
+QUESTION_PREWARM_LEAD = 30  # ثانیه قبل از چرخش
+QUESTION_PAYLOAD_TTL = 24 * 3600  # ثانیه
+
+# جریان SSE سوال فعال (api/async/question-events/)
+QUESTION_EVENTS_POLL_INTERVAL = 1.0  # ثانیه؛ بررسی نسخه سوال در کش برای چرخش در پروسه‌های دیگر
+QUESTION_EVENTS_HEARTBEAT = 15  # ثانیه
+
+# long-poll پاسخ تیکت‌ها (api/async/tickets/<pk>/wait/)
+TICKET_EVENTS_POLL_INTERVAL = 1.0  # ثانیه؛ یک خواندن دفتر رویدادهای کش در هر پروسه (نه برای هر منتظر)
+TICKET_EVENTS_TTL = 60  # ثانیه؛ نگهداری رویدادهای پاسخ در دفتر کش
+TICKET_STATE_TTL = 5 * 60  # ثانیه؛ سقف کهنگی وضعیت در کش اگر پاسخی بدون notify_reply ثبت شود
+
+# هش رمز عبور در pool پروسه‌ها؛ با پر بودن صف، ورود و ثبت‌نام پاسخ 503 می‌گیرند
+PASSWORD_HASH_WORKERS = 2  # صفر: هش در همان thread درخواست
+PASSWORD_HASH_MAX_PENDING = 32
+PASSWORD_HASH_QUEUE_TIMEOUT = 2  # ثانیه
+
+# پنل ادمین جدول‌های بزرگ: بالاتر از این تعداد، شمارش دقیق انجام نمی‌شود
+ADMIN_EXACT_COUNT_LIMIT = 10000
+ADMIN_CORRECT_RESPONDERS_PER_PAGE = 50
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
@@ -1,6 +1,18 @@
 # admin.py
+from django.conf import settings
+from django import forms
 from django.contrib import admin
+from django.contrib.admin import helpers
+from django.template.response import TemplateResponse
+from django.utils.html import format_html, format_html_join
 from .models import *
+from .archive import CorrectResponder
+from .authentication import revoke_tokens
+from .draw import draw_winners
+from .pagination import EstimatedCountPaginator
+from .stats import question_stats
+from . import tickets
+from .ticket_search import search_tickets
 from django.contrib.auth.admin import UserAdmin
 
 
@@ -31,6 +43,16 @@ class CustomUserAdmin(UserAdmin):
     list_display = ('phone_number', 'first_name', 'last_name', 'is_staff')
     search_fields = ('phone_number', 'first_name', 'last_name')
     ordering = ('phone_number',)
+    # جدول کاربران بزرگ است؛ COUNT(*) روی کل جدول اجرا نمی‌شود
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['revoke_auth_tokens']
+
+    @admin.action(description='ابطال توکن‌های ورود')
+    def revoke_auth_tokens(self, request, queryset):
+        for user in queryset:
+            revoke_tokens(user)
+        self.message_user(request, f"توکن‌های {queryset.count()} کاربر باطل شد.")
 
 
 admin.site.register(User, CustomUserAdmin)
@@ -42,17 +64,65 @@ class ChoiceInline(admin.TabularInline):
 
 
 class QuestionAdmin(admin.ModelAdmin):
-    list_display = ('is_active', 'expiry_date')
+    list_display = ('is_active', 'is_archived', 'expiry_date')
+    list_filter = ('is_archived',)
+    search_fields = ('text',)
+    exclude = ('correct_responders',)
+    readonly_fields = ('answer_stats',)
     inlines = [ChoiceInline]
+    actions = ['draw_prize_winners']
+
+    @admin.action(description='قرعه‌کشی بین پاسخ‌دهندگان درست')
+    def draw_prize_winners(self, request, queryset):
+        count = getattr(settings, 'PRIZE_DRAW_WINNERS', 10)
+        for question in queryset:
+            prize_draw = draw_winners(question.pk, count, user=request.user)
+            phone_numbers = dict(User.objects.filter(pk__in=prize_draw.winners).values_list('pk', 'phone_number'))
+            self.message_user(
+                request,
+                f"{question}: برندگان {', '.join(phone_numbers.get(pk, str(pk)) for pk in prize_draw.winners) or '-'} "
+                f"(seed: {prize_draw.seed}، شرکت‌کنندگان: {prize_draw.candidates_count})",
+            )
+
+    @admin.display(description='آمار پاسخ‌ها')
+    def answer_stats(self, obj):
+        if not obj.pk:
+            return '-'
+        stats = question_stats(obj.pk)
+        rows = [(f"گزینه: {row['text']}", row['total'], '-') for row in stats['choices']]
+        rows += [(f"استان: {row['province']}", row['total'], row['correct']) for row in stats['provinces']]
+        rows += [(f"جنسیت: {row['gender']}", row['total'], row['correct']) for row in stats['genders']]
+        if not rows:
+            return '-'
+        return format_html(
+            '<table><tr><th>{}</th><th>{}</th><th>{}</th></tr>{}</table>',
+            'مقدار', 'تعداد پاسخ', 'پاسخ درست',
+            format_html_join('', '<tr><td>{}</td><td>{}</td><td>{}</td></tr>', rows),
+        )
 
-    def get_form(self, request, obj=None, **kwargs):
-        form = super().get_form(request, obj, **kwargs)
-        if obj:  # فقط زمانی که یک سوال خاص در حال ویرایش است
-            correct_users = UserResponse.objects.filter(
-                question=obj, is_correct=True
-            ).values_list('user', flat=True)
-            form.base_fields['correct_responders'].queryset = obj.correct_responders.filter(id__in=correct_users)
-        return form
+    def correct_responders(self, question_id):
+        """
+        پاسخ‌دهندگان درست یک سوال؛ برای سوال بایگانی‌شده ردیف‌های correct_responders حذف شده‌اند
+        و لیست از پاسخ‌های بایگانی‌شده خوانده می‌شود
+        """
+        if not str(question_id).isdigit():
+            return CorrectResponder.objects.none()
+        fields = ('user__phone_number', 'user__first_name', 'user__last_name')
+        if Question.objects.filter(pk=question_id, is_archived=True).exists():
+            return ArchivedResponse.objects.filter(
+                question_id=question_id, is_correct=True
+            ).select_related('user').only(*fields).order_by('id')
+        return CorrectResponder.objects.filter(
+            question_id=question_id
+        ).select_related('user').only(*fields).order_by('user_id')
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        # پاسخ‌دهندگان درست به جای multi-select روی همه کاربران، صفحه به صفحه و فقط خواندنی نمایش داده می‌شوند
+        paginator = EstimatedCountPaginator(
+            self.correct_responders(object_id), getattr(settings, 'ADMIN_CORRECT_RESPONDERS_PER_PAGE', 50)
+        )
+        extra_context = {**(extra_context or {}), 'responders_page': paginator.get_page(request.GET.get('responders_page'))}
+        return super().change_view(request, object_id, form_url, extra_context)
 
 
 admin.site.register(Question, QuestionAdmin)
@@ -61,10 +131,25 @@ admin.site.register(Question, QuestionAdmin)
 @admin.register(UserResponse)
 class UserResponseAdmin(admin.ModelAdmin):
     list_display = ('user', 'question_text', 'selected_choice_text', 'is_correct')
-    search_fields = ('user__username', 'user__phone_number', 'question__text')
+    list_select_related = ('user', 'question', 'selected_choice')
+    search_fields = ('user__phone_number', 'question__text')
     list_filter = ('is_correct', 'question__is_active')
     ordering = ('-id',)
     readonly_fields = ('is_correct',)
+    # به جای select روی کل جدول‌ها
+    autocomplete_fields = ('question',)
+    raw_id_fields = ('user', 'selected_choice')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # شماره موبایل با تطابق کامل (ایندکس یکتا) و بقیه عبارت‌ها روی متن سوال‌ها (جدول کوچک)
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if search_term.isdigit():
+            return queryset.filter(user__phone_number=search_term), False
+        return queryset.filter(question__in=Question.objects.filter(text__icontains=search_term)), False
 
     # نمایش متن سؤال و گزینه به جای آیدی‌ها
     def question_text(self, obj):
@@ -85,6 +170,30 @@ class UserResponseAdmin(admin.ModelAdmin):
         return readonly
 
 
+@admin.register(PrizeDraw)
+class PrizeDrawAdmin(admin.ModelAdmin):
+    list_display = ('question', 'candidates_count', 'seed', 'created_by', 'created_at')
+    readonly_fields = ('question', 'seed', 'candidates_count', 'winners', 'created_by', 'created_at')
+    raw_id_fields = ('question',)
+
+    def has_add_permission(self, request):
+        # قرعه‌کشی فقط از طریق action سوالات یا دستور draw_winners انجام می‌شود
+        return False
+
+
+@admin.register(OutboundSMS)
+class OutboundSMSAdmin(admin.ModelAdmin):
+    list_display = ('phone_number', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('phone_number',)
+    # متن پیام شامل کد تأیید است و در لیست نمایش داده نمی‌شود
+    exclude = ('body',)
+    readonly_fields = ('phone_number', 'status', 'attempts', 'next_attempt_at', 'last_error', 'created_at', 'sent_at')
+
+    def has_add_permission(self, request):
+        return False
+
+
 class TicketReplyInline(admin.TabularInline):
     """
     نمایش پاسخ‌های مرتبط با هر تیکت به صورت اینلاین
@@ -97,11 +206,9 @@ class TicketReplyInline(admin.TabularInline):
     def has_delete_permission(self, request, obj=None):
         return True
 
-    def save_model(self, request, obj, form, change):
-        # تنظیم مدیر به صورت خودکار هنگام ثبت پاسخ
-        if not obj.admin:
-            obj.admin = request.user
-        super().save_model(request, obj, form, change)
+
+class BulkReplyForm(forms.Form):
+    reply_body = forms.CharField(label='متن پاسخ', widget=forms.Textarea)
 
 
 @admin.register(Ticket)
@@ -113,6 +220,44 @@ class TicketAdmin(admin.ModelAdmin):
     list_filter = ('status', 'created_at')
     search_fields = ('subject', 'user__phone_number')
     inlines = [TicketReplyInline]
+    actions = ['bulk_reply']
+
+    def get_search_results(self, request, queryset, search_term):
+        # شماره موبایل با پیشوند و بقیه عبارت‌ها با ایندکس متن کامل (موضوع، متن و پاسخ‌ها) جستجو می‌شوند
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if search_term.isdigit():
+            return queryset.filter(user__phone_number__startswith=search_term), False
+        return search_tickets(queryset, search_term), False
+
+    @admin.action(description='پاسخ گروهی به تیکت‌های انتخاب‌شده')
+    def bulk_reply(self, request, queryset):
+        form = BulkReplyForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            replies = tickets.bulk_reply(queryset.values_list('pk', flat=True), form.cleaned_data['reply_body'], request.user)
+            self.message_user(request, f"به {len(replies)} تیکت پاسخ داده شد.")
+            return None
+        return TemplateResponse(request, 'admin/home/ticket/bulk_reply.html', {
+            **self.admin_site.each_context(request),
+            'title': 'پاسخ گروهی',
+            'opts': self.model._meta,
+            'queryset': queryset,
+            'form': form,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not TicketReply:
+            return super().save_formset(request, form, formset, change)
+        # پاسخ‌های جدید اینلاین با یک bulk_create و یک UPDATE وضعیت ثبت می‌شوند
+        instances = formset.save(commit=False)
+        for obj in formset.deleted_objects:
+            obj.delete()
+        for reply in instances:
+            if reply.pk:
+                reply.save()
+        tickets.create_replies([reply for reply in instances if not reply.pk], request.user)
 
 
 @admin.register(ContactInfo)
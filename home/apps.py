@@ -7,6 +7,5 @@ class HomeConfig(AppConfig):
     name = 'home'
 
     def ready(self):
-        import threading
-        from .apscheduler import start_scheduler
-        threading.Thread(target=start_scheduler).start()
\ No newline at end of file
+        # ثبت system checkهای کش مشترک و triggerهای جستجوی تیکت
+        from . import question_cache, ticket_search  # noqa: F401
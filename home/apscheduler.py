@@ -1,29 +1,176 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from django_apscheduler.jobstores import DjangoJobStore
+from datetime import timedelta
+import logging
+
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
+from . import bitmap
+from .archive import archive_question, mark_archived
+from .leader import set_local_rearm
 from .models import Question
+from .question_cache import invalidate_active_question, prewarm, swap
+from .question_events import publish_rotation
+from .stats import reconcile_question
+
+logger = logging.getLogger(__name__)
+
+ROTATION_JOB_ID = 'rotate_questions'
+PREWARM_JOB_ID = 'prewarm_question'
+
+scheduler = None
+
 
 def check_expired_questions():
     """بررسی سوالات منقضی و فعال کردن سوال جدید"""
-    expired_questions = Question.objects.filter(expiry_date__lte=timezone.now())
-    expired_questions.delete()
+    archive_expired_questions(switch_questions())
 
-    next_question = Question.objects.filter(is_active=False).order_by('expiry_date').first()
+
+def switch_questions():
+    """
+    علامت‌گذاری سوالات منقضی و فعال کردن سوال بعدی؛
+    خروجی آیدی سوال‌هایی که پاسخ‌هایشان باید بایگانی شوند
+    """
+    now = timezone.now()
+    was_active = Question.objects.active().exists()
+    expired_questions = Question.objects.filter(expiry_date__lte=now, is_archived=False)
+    archive = getattr(settings, 'QUESTION_EXPIRY_MODE', 'archive') == 'archive'
+    expired_ids = []
+    if archive:
+        expired_ids = list(expired_questions.values_list('id', flat=True))
+        mark_archived(expired_ids)
+    else:
+        expired_questions.delete()
+
+    # سوال بعدی فقط وقتی فعال می‌شود که سوال فعالی نمانده یا زمان سوال بعدی رسیده باشد
+    active_question = Question.objects.active().first()
+    next_question = None
+    if not active_question or active_question.next_question <= now:
+        next_question = queued_question()
+        if next_question:
+            with transaction.atomic():
+                Question.objects.active().update(is_active=False)
+                Question.objects.filter(pk=next_question.pk).update(is_active=True)
+
+    # اگر سوال فعال عوض نشده باشد نسخه اشاره‌گر ثابت می‌ماند تا پروسه‌ها و کلاینت‌های SSE بی‌دلیل بارگذاری نکنند
+    changed = next_question is not None or (was_active and active_question is None)
+    # تغییرات گروهی از مسیر Question.save عبور نمی‌کنند؛ داده سوال جدید از قبل
+    # در کش آماده است (prewarm) و فقط اشاره‌گر سوال فعال عوض می‌شود
     if next_question:
-        next_question.is_active = True
-        next_question.save()
+        swap(next_question.pk)
+    elif changed:
+        invalidate_active_question()
+    if changed:
+        # اطلاع به کلاینت‌های SSE همین پروسه؛ پروسه‌های دیگر تغییر نسخه در کش را می‌بینند
+        publish_rotation()
+
+    return expired_ids
+
+
+def archive_expired_questions(question_ids):
+    """انتقال پاسخ‌ها بعد از فعال شدن سوال بعدی تا چرخش منتظر بایگانی نماند"""
+    for question_id in question_ids:
+        try:
+            archive_question(question_id)
+            # آمار و bitmap نهایی سوال از روی پاسخ‌های بایگانی‌شده اصلاح می‌شوند
+            reconcile_question(question_id)
+            bitmap.rebuild(question_id)
+        except Exception:
+            # خطای یک سوال مانع بایگانی سوال‌های دیگر نمی‌شود
+            logger.exception('archiving question %s failed', question_id)
+
+
+def queued_question():
+    """سوالی که در چرخش بعدی فعال می‌شود"""
+    return Question.objects.filter(is_active=False, is_archived=False).order_by('expiry_date').first()
+
+
+def prewarm_queued_question():
+    """آماده کردن داده سوال بعدی در کش پیش از زمان فعال شدن آن"""
+    question = queued_question()
+    if question:
+        prewarm(question.pk)
 
-def start_scheduler():
-    """شروع شِدولر برای بررسی سوالات"""
-    scheduler = BackgroundScheduler()
-    scheduler.add_jobstore(DjangoJobStore(), 'default')
 
-    # ثبت وظیفه بررسی سوالات منقضی
+def next_transition_at():
+    """زمان تغییر بعدی سوال‌ها؛ اگر تغییری در پیش نباشد None"""
+    times = []
+
+    earliest_expiry = Question.objects.filter(is_archived=False).order_by('expiry_date').values_list(
+        'expiry_date', flat=True
+    ).first()
+    if earliest_expiry:
+        times.append(earliest_expiry)
+
+    # سوال فعال فقط با وجود سوالی در صف عوض می‌شود؛ next_question گذشته بدون صف چرخش پشت سر هم می‌ساخت
+    if queued_question() is not None:
+        active_question = Question.objects.active().first()
+        # سوالی در صف است ولی سوال فعالی نداریم: همین حالا
+        times.append(active_question.next_question if active_question else timezone.now())
+
+    return min(times) if times else None
+
+
+def rotate_questions():
+    """اجرای چرخش سوال‌ها و زمان‌بندی دوباره برای تغییر بعدی"""
+    expired_ids = []
+    try:
+        expired_ids = switch_questions()
+    finally:
+        # job یک‌باره است؛ حتی با خطا باید دوباره زمان‌بندی شود وگرنه چرخش متوقف می‌ماند
+        arm_rotation()
+    archive_expired_questions(expired_ids)
+
+
+def arm_rotation():
+    """زمان‌بندی یک job یک‌باره دقیقاً برای لحظه تغییر بعدی"""
+    if scheduler is None or not scheduler.running:
+        return
+
+    run_at = next_transition_at()
+    if run_at is None:
+        # تا ذخیره شدن سوال جدید هیچ کاری برای انجام نیست
+        for job_id in (ROTATION_JOB_ID, PREWARM_JOB_ID):
+            if scheduler.get_job(job_id):
+                scheduler.remove_job(job_id)
+        return
+
+    now = timezone.now()
     scheduler.add_job(
-        check_expired_questions,
-        'interval',
-        minutes=1,
-        id='check_expired',
-        replace_existing=True
+        rotate_questions,
+        'date',
+        run_date=max(run_at, now),
+        id=ROTATION_JOB_ID,
+        replace_existing=True,
+        misfire_grace_time=None,
     )
+    # داده سوال بعدی چند ثانیه پیش از چرخش ساخته می‌شود تا در لحظه چرخش کوئری‌ای لازم نباشد
+    lead = timedelta(seconds=getattr(settings, 'QUESTION_PREWARM_LEAD', 30))
+    scheduler.add_job(
+        prewarm_queued_question,
+        'date',
+        run_date=max(run_at - lead, now),
+        id=PREWARM_JOB_ID,
+        replace_existing=True,
+        misfire_grace_time=None,
+    )
+
+
+def start_scheduler():
+    """شروع شِدولر برای بررسی سوالات"""
+    global scheduler
+    # jobها در حافظه نگه داشته می‌شوند؛ هر رهبر جدید آن‌ها را از روی جدول سوالات دوباره می‌سازد
+    scheduler = BackgroundScheduler()
     scheduler.start()
+    arm_rotation()
+    set_local_rearm(arm_rotation)
+    return scheduler
+
+
+def stop_scheduler():
+    """توقف شِدولر؛ برای زمانی که رهبری از دست می‌رود یا پروسه خاموش می‌شود"""
+    global scheduler
+    set_local_rearm(None)
+    if scheduler is not None and scheduler.running:
+        scheduler.shutdown(wait=False)
+    scheduler = None
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.db import transaction
+
+from .models import ArchivedResponse, Question, UserResponse
+
+CorrectResponder = Question.correct_responders.through
+
+
+def chunk_size():
+    return getattr(settings, 'ARCHIVE_CHUNK_SIZE', 1000)
+
+
+def mark_archived(question_ids):
+    """علامت‌گذاری سوالات به عنوان بایگانی‌شده؛ از این لحظه در چرخش سوال‌ها دیده نمی‌شوند"""
+    return Question.objects.filter(pk__in=question_ids).update(is_archived=True, is_active=False)
+
+
+def _move_responses_chunk(question_id, size):
+    with transaction.atomic():
+        rows = list(
+            UserResponse.objects.filter(question_id=question_id)
+            .order_by('id')
+            .values_list('id', 'user_id', 'selected_choice_id', 'is_correct')[:size]
+        )
+        if not rows:
+            return 0
+        ArchivedResponse.objects.bulk_create([
+            ArchivedResponse(
+                question_id=question_id,
+                user_id=user_id,
+                selected_choice_id=selected_choice_id,
+                is_correct=is_correct,
+            )
+            for _, user_id, selected_choice_id, is_correct in rows
+        ])
+        UserResponse.objects.filter(id__in=[row[0] for row in rows]).delete()
+    return len(rows)
+
+
+def _delete_correct_responders_chunk(question_id, size):
+    with transaction.atomic():
+        ids = list(
+            CorrectResponder.objects.filter(question_id=question_id).order_by('id').values_list('id', flat=True)[:size]
+        )
+        if ids:
+            CorrectResponder.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def archive_question(question_id, size=None):
+    """
+    انتقال پاسخ‌های یک سوال بایگانی‌شده به ArchivedResponse.
+    هر تکه در تراکنش جداگانه انجام می‌شود تا قفل نوشتن روی جدول‌های اصلی طولانی نشود.
+    """
+    size = size or chunk_size()
+    moved = 0
+    while True:
+        count = _move_responses_chunk(question_id, size)
+        moved += count
+        if count < size:
+            break
+    while _delete_correct_responders_chunk(question_id, size) == size:
+        pass
+    return moved
+
+
+def archive_pending(size=None):
+    """ادامه بایگانی سوالاتی که انتقال پاسخ‌هایشان کامل نشده است"""
+    question_ids = UserResponse.objects.filter(question__is_archived=True).values_list('question_id', flat=True).distinct()
+    return sum(archive_question(question_id, size) for question_id in list(question_ids))
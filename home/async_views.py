@@ -0,0 +1,271 @@
+"""
+نسخه‌های async (ASGI) از ویوهای پرترافیک مسابقه.
+این ویوها از DRF عبور نمی‌کنند؛ احراز هویت، محدودیت نرخ و پاسخ JSON همین‌جا انجام می‌شود.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from . import hashing
+from .authentication import aauthenticate, issue_token
+from .ingestion import ingest_response
+from .models import Question, User
+from .otp import get_otp_store
+from .question_cache import aget_active_question
+from .question_events import get_relay
+from .serializers import UserSerializer
+from .submission import NO_ACTIVE_QUESTION, SubmissionError, check_choice
+from .ticket_events import aget_state, wait_for_reply
+from .throttling import IPRateThrottle, PhoneRateThrottle, TokenRateThrottle
+from .views import CORRECT_RESPONDER_FIELDS, CorrectRespondersView, correct_responder_row
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def error_response(message, status=400):
+    return json_response({'error': message}, status)
+
+
+def hashing_busy_response():
+    # مثل views.hashing_busy_response؛ صف هش رمز عبور پر است
+    response = error_response('سرور مشغول است، لطفاً چند لحظه دیگر دوباره تلاش کنید.', 503)
+    response['Retry-After'] = '1'
+    return response
+
+
+def parse_body(request):
+    """داده بدنه درخواست (JSON یا فرم)؛ برای JSON نامعتبر ValueError"""
+    if request.content_type != 'application/json':
+        return request.POST
+    data = json.loads(request.body or b'{}')
+    return data if isinstance(data, dict) else {}
+
+
+async def iter_by_user_id(rows, chunk_size=2000):
+    """
+    خواندن تکه‌تکه ردیف‌های مرتب بر اساس user_id (ستون اول) با keyset.
+    aiterator روی values_list کوئری اول را داخل event loop اجرا می‌کند و قابل استفاده نیست.
+    """
+    cursor = 0
+    while True:
+        page = [row async for row in rows.filter(user_id__gt=cursor)[:chunk_size]]
+        for row in page:
+            yield row
+        if len(page) < chunk_size:
+            break
+        cursor = page[-1][0]
+
+
+async def stream_correct_responders(rows, chunk_size=500):
+    """نسخه async از views.stream_correct_responders"""
+    yield '{"correct_responders": ['
+    separator = ''
+    chunk = []
+    async for row in rows:
+        chunk.append(separator + json.dumps(correct_responder_row(row), ensure_ascii=False))
+        separator = ','
+        if len(chunk) >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+    yield ']}'
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncAPIView(View):
+    """پایه ویوهای async با محدودیت نرخ مثل ThrottleFirstMixin (پیش از احراز هویت)"""
+    throttle_classes = []
+    throttle_scope = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        # مثل request.data در DRF؛ PhoneRateThrottle شماره موبایل را از بدنه می‌خواند
+        try:
+            request.data = parse_body(request) if request.method == 'POST' else {}
+        except ValueError:
+            return error_response('بدنه درخواست JSON معتبر نیست.')
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            # شمارنده‌ها در کش throttle هستند و ممکن است Redis باشد (I/O شبکه)
+            if not await sync_to_async(throttle.allow_request)(request, self):
+                response = error_response('تعداد درخواست‌ها بیش از حد مجاز است.', 429)
+                wait = throttle.wait()
+                if wait is not None:
+                    response['Retry-After'] = str(int(wait) + 1)
+                return response
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncActiveQuestionView(AsyncAPIView):
+    """نمایش سوال فعال"""
+
+    async def get(self, request):
+        snapshot = await aget_active_question()
+        if snapshot.data is None:
+            return json_response({'detail': 'سوال فعالی یافت نشد.'}, 404)
+        return json_response(snapshot.data)
+
+
+class AsyncSubmitResponseView(AsyncAPIView):
+    """
+    ثبت پاسخ کاربر برای سوال فعال.
+    اعتبارسنجی روی snapshot بدون دیتابیس انجام می‌شود؛ ORM async تراکنش ندارد،
+    پس خود ثبت پاسخ (یک تراکنش) در یک sync_to_async اجرا می‌شود.
+    """
+    throttle_classes = [TokenRateThrottle, IPRateThrottle]
+    throttle_scope = 'submit_response'
+
+    async def post(self, request):
+        user = await aauthenticate(request)
+        if user is None:
+            return error_response('احراز هویت لازم است.', 401)
+
+        selected_choice_id = request.data.get('selected_choice_id')
+
+        try:
+            check_choice(await aget_active_question(), selected_choice_id)
+            if {'province', 'gender'} & user.get_deferred_fields():
+                await user.arefresh_from_db(fields=['province', 'gender'])
+            is_correct = await sync_to_async(ingest_response)(user, selected_choice_id)
+        except SubmissionError as e:
+            return error_response(e.message)
+
+        return json_response({'message': 'پاسخ شما ثبت شد.', 'is_correct': is_correct}, 201)
+
+
+class AsyncLoginView(AsyncAPIView):
+    """
+    ورود با شماره موبایل و رمز عبور؛ مثل LoginView ولی بررسی رمز عبور در pool هش
+    بدون مسدود کردن event loop انجام می‌شود (با پر بودن صف پاسخ 503).
+    """
+    throttle_classes = [PhoneRateThrottle, IPRateThrottle]
+    throttle_scope = 'login'
+
+    async def post(self, request):
+        phone_number = request.data.get('phone_number')
+        password = request.data.get('password')
+        if not phone_number or not password:
+            return error_response('شماره موبایل و رمز عبور الزامی هستند.')
+
+        try:
+            user = await hashing.aauthenticate_user(phone_number, password)
+        except hashing.HashingBusy:
+            return hashing_busy_response()
+        if user is None:
+            return error_response('نام کاربری یا رمز عبور اشتباه است.', 401)
+
+        return json_response({'user': UserSerializer(user).data, 'token': issue_token(user)})
+
+
+class AsyncSignUpView(AsyncAPIView):
+    """ثبت‌نام کاربر جدید؛ مثل SignUpView با هش رمز عبور async"""
+
+    async def post(self, request):
+        phone_number = request.data.get('phone_number')
+        otp_store = get_otp_store()
+        if not await sync_to_async(otp_store.is_verified)(phone_number):
+            return error_response('شماره موبایل تأیید نشده است.')
+
+        serializer = UserSerializer(data=request.data)
+        # اعتبارسنجی (از جمله یکتایی شماره موبایل) کوئری می‌زند
+        if not await sync_to_async(serializer.is_valid)():
+            return json_response(serializer.errors, 400)
+        data = dict(serializer.validated_data)
+        data.pop('confirm_password')
+        try:
+            password_hash = await hashing.ahash_password(data.pop('password'))
+        except hashing.HashingBusy:
+            return hashing_busy_response()
+        user = await sync_to_async(User.objects.create_user)(
+            phone_number=data.pop('phone_number'), password_hash=password_hash, **data
+        )
+        await sync_to_async(otp_store.discard)(phone_number)
+
+        return json_response({'user': UserSerializer(user).data, 'token': issue_token(user)}, 201)
+
+
+class AsyncCorrectRespondersView(AsyncAPIView):
+    """لیست کاربران با پاسخ صحیح به سوال فعال؛ پارامترها مثل CorrectRespondersView"""
+
+    async def get(self, request):
+        question_id = (await aget_active_question()).question_id
+        if question_id is None:
+            return error_response(NO_ACTIVE_QUESTION)
+
+        try:
+            cursor = int(request.GET.get('cursor', 0))
+            limit = int(request.GET.get('limit', CorrectRespondersView.default_limit))
+        except ValueError:
+            return error_response('پارامتر cursor یا limit معتبر نیست.')
+        limit = max(1, min(limit, CorrectRespondersView.max_limit))
+
+        rows = Question.correct_responders.through.objects.filter(
+            question_id=question_id, user_id__gt=cursor
+        ).order_by('user_id').values_list(*CORRECT_RESPONDER_FIELDS)
+
+        if request.GET.get('stream') in ('1', 'true'):
+            return StreamingHttpResponse(
+                stream_correct_responders(iter_by_user_id(rows)),
+                content_type='application/json',
+            )
+
+        page = [correct_responder_row(row) async for row in rows[:limit + 1]]
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = page[-1]['id']
+
+        return json_response({'correct_responders': page, 'next_cursor': next_cursor})
+
+
+class QuestionEventsView(AsyncAPIView):
+    """
+    جریان SSE سوال فعال به جای polling: رویداد question با وضعیت فعلی هنگام اتصال
+    و رویداد rotation با داده سوال جدید در لحظه چرخش.
+    """
+
+    async def get(self, request):
+        response = StreamingHttpResponse(
+            get_relay().stream(request.headers.get('Last-Event-ID')),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class TicketReplyWaitView(AsyncAPIView):
+    """
+    long-poll پاسخ جدید تیکت: ?since=<آیدی آخرین پاسخ دریافت‌شده>&timeout=<ثانیه>
+    با ثبت پاسخ جدید فوراً و در غیر این صورت پس از timeout پاسخ می‌دهد؛
+    سپس کلاینت پاسخ‌ها را از tickets/<pk>/?since= می‌گیرد.
+    """
+    default_timeout = 25
+    max_timeout = 55
+
+    async def get(self, request, pk):
+        user = await aauthenticate(request)
+        if user is None:
+            return error_response('احراز هویت لازم است.', 401)
+
+        try:
+            since = int(request.GET.get('since', 0))
+            timeout = float(request.GET.get('timeout', self.default_timeout))
+        except ValueError:
+            return error_response('پارامتر since یا timeout معتبر نیست.')
+        timeout = max(0, min(timeout, self.max_timeout))
+
+        # کاربران فقط به تیکت‌های خودشان دسترسی دارند
+        state = await aget_state(pk)
+        if state is None or state['owner'] != user.pk:
+            return json_response({'detail': 'تیکت یافت نشد.'}, 404)
+
+        state = await wait_for_reply(pk, since, timeout) or state
+        last_reply_id = state['last_reply']
+        return json_response({'changed': (last_reply_id or 0) > since, 'last_reply_id': last_reply_id})
@@ -0,0 +1,184 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+from .models import TokenRevocation, User
+
+# قالب توکن: v1.<user_id>.<issued_at>.<key_version>.<signature>
+TOKEN_PREFIX = 'v1'
+
+
+def signing_keys():
+    return getattr(settings, 'AUTH_TOKEN_KEYS', None) or {'1': settings.SECRET_KEY}
+
+
+def current_key_version():
+    return str(getattr(settings, 'AUTH_TOKEN_KEY_VERSION', '1'))
+
+
+def token_ttl():
+    return getattr(settings, 'AUTH_TOKEN_TTL', 30 * 24 * 3600)
+
+
+def _signature(payload, key_version):
+    secret = signing_keys()[key_version]
+    return salted_hmac('home.authentication', payload, secret=secret, algorithm='sha256').hexdigest()
+
+
+def issue_token(user):
+    """ساخت توکن امضاشده برای کاربر؛ بدون نوشتن در دیتابیس"""
+    payload = f"{TOKEN_PREFIX}.{user.pk}.{int(time.time())}.{current_key_version()}"
+    return f"{payload}.{_signature(payload, current_key_version())}"
+
+
+def _verify_signature(token):
+    """بررسی امضا و انقضای توکن؛ خروجی (آیدی کاربر، زمان صدور) یا None"""
+    parts = token.split('.')
+    if len(parts) != 5 or parts[0] != TOKEN_PREFIX:
+        return None
+    _, user_id, issued_at, key_version, signature = parts
+    if key_version not in signing_keys():
+        return None
+    if not constant_time_compare(signature, _signature('.'.join(parts[:4]), key_version)):
+        return None
+    try:
+        user_id, issued_at = int(user_id), int(issued_at)
+    except ValueError:
+        return None
+    if issued_at + token_ttl() < time.time():
+        return None
+    return user_id, issued_at
+
+
+def verify_token(token):
+    """بررسی امضا، انقضا و ابطال توکن؛ خروجی آیدی کاربر یا None"""
+    claims = _verify_signature(token)
+    if claims is None or claims[1] <= revocations.revoked_before(claims[0]):
+        return None
+    return claims[0]
+
+
+async def averify_token(token):
+    claims = _verify_signature(token)
+    if claims is None or claims[1] <= await revocations.arevoked_before(claims[0]):
+        return None
+    return claims[0]
+
+
+def revocation_cutoff():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'AUTH_TOKEN_TTL', 30 * 24 * 3600))
+
+
+class RevocationList:
+    """
+    نسخه داخل پروسه از جدول TokenRevocation.
+    هر AUTH_TOKEN_REVOCATION_REFRESH ثانیه یک بار از دیتابیس خوانده می‌شود،
+    پس ابطال در پروسه‌های دیگر حداکثر با همین تأخیر اعمال می‌شود.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked = {}
+        self._loaded_at = None
+
+    def _stale(self):
+        interval = getattr(settings, 'AUTH_TOKEN_REVOCATION_REFRESH', 60)
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= interval
+
+    def _set(self, rows):
+        with self._lock:
+            self._revoked = {user_id: revoked_at.timestamp() for user_id, revoked_at in rows}
+            self._loaded_at = time.monotonic()
+
+    def _rows(self):
+        # توکن‌های صادرشده پیش از ابطال‌های قدیمی‌تر از AUTH_TOKEN_TTL خودشان منقضی شده‌اند
+        return TokenRevocation.objects.filter(revoked_at__gt=revocation_cutoff()).values_list('user_id', 'revoked_at')
+
+    def revoked_before(self, user_id):
+        if self._stale():
+            self._set(list(self._rows()))
+        return self._revoked.get(user_id, 0)
+
+    async def arevoked_before(self, user_id):
+        if self._stale():
+            self._set([row async for row in self._rows()])
+        return self._revoked.get(user_id, 0)
+
+    def add(self, user_id, revoked_at):
+        with self._lock:
+            self._revoked[user_id] = revoked_at.timestamp()
+
+    def reset(self):
+        self._loaded_at = None
+
+
+revocations = RevocationList()
+
+
+def revoke_tokens(user):
+    """ابطال همه توکن‌های امضاشده‌ای که تا این لحظه برای کاربر صادر شده‌اند"""
+    revoked_at = timezone.now()
+    TokenRevocation.objects.update_or_create(user_id=user.pk, defaults={'revoked_at': revoked_at})
+    revocations.add(user.pk, revoked_at)
+    # جدول فقط ابطال‌های هنوز مؤثر را نگه می‌دارد
+    TokenRevocation.objects.filter(revoked_at__lte=revocation_cutoff()).delete()
+
+
+def lazy_user(user_id):
+    # فقط آیدی کاربر مشخص است؛ فیلدهای دیگر در صورت نیاز با کوئری جداگانه خوانده می‌شوند
+    return User.from_db('default', ['id'], [user_id])
+
+
+def _token_from_header(request, keyword='Token'):
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != keyword.lower().encode():
+        return None
+    try:
+        return auth[1].decode()
+    except UnicodeError:
+        return None
+
+
+async def aauthenticate(request):
+    """
+    احراز هویت برای ویوهای async (بدون DRF)؛ خروجی کاربر یا None.
+    توکن امضاشده بدون کوئری و توکن قدیمی با کوئری async بررسی می‌شود.
+    """
+    token = _token_from_header(request)
+    if token is None:
+        return None
+    if token.startswith(f"{TOKEN_PREFIX}."):
+        user_id = await averify_token(token)
+        return lazy_user(user_id) if user_id is not None else None
+    legacy = await Token.objects.select_related('user').filter(key=token).afirst()
+    if legacy is None or not legacy.user.is_active:
+        return None
+    return legacy.user
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    احراز هویت با توکن امضاشده در هدر 'Authorization: Token <token>' بدون کوئری دیتابیس.
+    توکن‌های قدیمی (مدل Token) به TokenAuthentication بعدی سپرده می‌شوند.
+    """
+    keyword = 'Token'
+
+    def authenticate(self, request):
+        token = _token_from_header(request, self.keyword)
+        if token is None or not token.startswith(f"{TOKEN_PREFIX}."):
+            return None
+
+        user_id = verify_token(token)
+        if user_id is None:
+            raise exceptions.AuthenticationFailed('توکن نامعتبر یا منقضی شده است.')
+        return lazy_user(user_id), token
+
+    def authenticate_header(self, request):
+        return self.keyword
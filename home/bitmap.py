@@ -0,0 +1,172 @@
+import operator
+import threading
+import zlib
+from collections import defaultdict
+from functools import lru_cache, reduce
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .buffers import WriteBehindBuffer
+from .models import ArchivedResponse, CorrectResponderBitmap, Question, UserResponse
+
+# بیت i در بایت i // 8 و موقعیت i % 8 قرار دارد (همان ترتیب int.from_bytes(..., 'little'))
+
+
+def encode(data):
+    return zlib.compress(bytes(data).rstrip(b'\x00'))
+
+
+def decode(blob):
+    return bytearray(zlib.decompress(blob)) if blob else bytearray()
+
+
+def set_bits(data, user_ids):
+    """روشن کردن بیت کاربران در bytearray؛ خروجی تعداد بیت‌های تازه روشن‌شده"""
+    added = 0
+    for user_id in user_ids:
+        index, bit = divmod(user_id, 8)
+        if index >= len(data):
+            data.extend(bytes(index + 1 - len(data)))
+        if not data[index] >> bit & 1:
+            data[index] |= 1 << bit
+            added += 1
+    return added
+
+
+def to_int(data):
+    return int.from_bytes(data, 'little')
+
+
+def iter_user_ids(bitmap):
+    """آیدی کاربران یک bitmap (عدد صحیح) به ترتیب صعودی"""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    for index, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            yield index * 8 + low.bit_length() - 1
+            byte ^= low
+
+
+@lru_cache(maxsize=32)
+def _load(question_id, version):
+    # با تغییر version (تعداد و زمان آخرین تغییر) نسخه جدید از دیتابیس خوانده می‌شود
+    blob = CorrectResponderBitmap.objects.filter(question_id=question_id).values_list('bitmap', flat=True).first()
+    return to_int(decode(blob)) if blob else 0
+
+
+def correct_count(question_id):
+    """تعداد کاربران با پاسخ درست بدون خواندن خود bitmap"""
+    return CorrectResponderBitmap.objects.filter(question_id=question_id).values_list(
+        'cardinality', flat=True
+    ).first() or 0
+
+
+def load(question_id):
+    """bitmap کاربران با پاسخ درست به صورت عدد صحیح"""
+    version = CorrectResponderBitmap.objects.filter(question_id=question_id).values_list(
+        'cardinality', 'updated_at'
+    ).first()
+    return _load(question_id, version) if version else 0
+
+
+def is_correct_responder(question_id, user_id):
+    return bool(load(question_id) >> user_id & 1)
+
+
+def combine_between(start, end, mode='union'):
+    """
+    اجتماع یا اشتراک bitmap سوالاتی که تاریخ انقضای آن‌ها بین start و end است.
+    مثلاً کاربرانی که به همه سوالات یک هفته پاسخ درست داده‌اند: mode='intersection'
+    """
+    question_ids = Question.objects.filter(expiry_date__gte=start, expiry_date__lt=end).values_list('id', flat=True)
+    bitmaps = [load(question_id) for question_id in question_ids]
+    if not bitmaps:
+        return 0
+    return reduce(operator.and_ if mode == 'intersection' else operator.or_, bitmaps)
+
+
+def add_users(question_id, user_ids):
+    """اضافه کردن کاربران به bitmap یک سوال در یک تراکنش"""
+    with transaction.atomic():
+        row = CorrectResponderBitmap.objects.select_for_update().filter(question_id=question_id).first()
+        if row is None:
+            try:
+                with transaction.atomic():
+                    row = CorrectResponderBitmap.objects.create(question_id=question_id)
+            except IntegrityError:
+                row = CorrectResponderBitmap.objects.select_for_update().get(question_id=question_id)
+        data = decode(row.bitmap)
+        added = set_bits(data, user_ids)
+        if added:
+            row.bitmap = encode(data)
+            row.cardinality += added
+            row.save(update_fields=['bitmap', 'cardinality', 'updated_at'])
+    return added
+
+
+def _flush_pending(items):
+    by_question = defaultdict(set)
+    for question_id, user_id in items:
+        by_question[question_id].add(user_id)
+    for question_id, user_ids in by_question.items():
+        add_users(question_id, user_ids)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = WriteBehindBuffer(
+                    _flush_pending,
+                    getattr(settings, 'BITMAP_FLUSH_MAX_SIZE', 1000),
+                    getattr(settings, 'BITMAP_FLUSH_INTERVAL', 1.0),
+                    getattr(settings, 'WRITE_BEHIND_MAX_ATTEMPTS', 30),
+                    # bitmap از روی پاسخ‌ها قابل ساخت دوباره است (rebuild_bitmaps)؛ آیتم‌های نوشته‌نشده فقط در لاگ می‌آیند
+                    close_timeout=getattr(settings, 'WRITE_BEHIND_CLOSE_TIMEOUT', 10),
+                )
+    return _writer
+
+
+def mark_correct(question_id, user_ids):
+    """
+    ثبت کاربران با پاسخ درست پس از commit تراکنش جاری.
+    برای جلوگیری از بازنویسی bitmap به ازای هر پاسخ، تغییرات به صورت دسته‌ای نوشته می‌شوند.
+    """
+    items = [(question_id, user_id) for user_id in user_ids]
+    if not items:
+        return
+
+    def enqueue():
+        writer = get_writer()
+        for item in items:
+            writer.add(item)
+
+    transaction.on_commit(enqueue)
+
+
+def count_correct_responses(question_id):
+    """تعداد پاسخ‌های درست زنده و بایگانی‌شده؛ برای مقایسه با cardinality"""
+    return sum(
+        model.objects.filter(question_id=question_id, is_correct=True).count()
+        for model in (UserResponse, ArchivedResponse)
+    )
+
+
+def rebuild(question_id, chunk_size=10000):
+    """ساخت دوباره bitmap یک سوال از روی پاسخ‌های درست زنده و بایگانی‌شده"""
+    data = bytearray()
+    cardinality = 0
+    for model in (UserResponse, ArchivedResponse):
+        user_ids = model.objects.filter(question_id=question_id, is_correct=True).values_list('user_id', flat=True)
+        cardinality += set_bits(data, user_ids.iterator(chunk_size=chunk_size))
+    CorrectResponderBitmap.objects.update_or_create(
+        question_id=question_id,
+        defaults={'bitmap': encode(data), 'cardinality': cardinality},
+    )
+    return cardinality
@@ -0,0 +1,158 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.db import DataError, IntegrityError
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    صف نوشتن با تأخیر؛ آیتم‌ها در حافظه جمع می‌شوند و به صورت دسته‌ای
+    با رسیدن به max_size یا گذشت interval ثانیه به flush_func داده می‌شوند.
+    اگر دسته‌ای با خطای دائمی (permanent_errors) رد شود، دسته نصف می‌شود تا آیتم خراب پیدا شود؛
+    با خطاهای دیگر (مثل قطعی دیتابیس) فاصله تلاش‌ها تا max_backoff دو برابر می‌شود.
+    آیتمی که نوشته نشود (خطای دائمی یا max_attempts تلاش ناموفق) به spill داده می‌شود تا از بین نرود.
+    """
+
+    def __init__(self, flush_func, max_size=500, interval=1.0, max_attempts=30,
+                 permanent_errors=(IntegrityError, DataError), describe=repr, spill=None,
+                 max_backoff=60.0, close_timeout=10.0):
+        self.flush_func = flush_func
+        # نمایش آیتم کنارگذاشته‌شده در لاگ
+        self.describe = describe
+        # ذخیره پایدار آیتم‌هایی که نوشته نشدند (مثلاً فایل)؛ بدون آن فقط در لاگ ثبت می‌شوند
+        self.spill = spill
+        self.max_size = max_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.permanent_errors = permanent_errors
+        self.max_backoff = max_backoff
+        self.close_timeout = close_timeout
+        self._items = []
+        self._failures = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, item):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('buffer is closed')
+            # (آیتم، تعداد تلاش‌های ناموفق)
+            self._items.append((item, 0))
+            size = len(self._items)
+            if self._thread is None:
+                self._start()
+        if size >= self.max_size and not self._failures:
+            self._wakeup.set()
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='write-behind-buffer', daemon=True)
+        self._thread.start()
+        # تخلیه صف هنگام خاموش شدن پروسه
+        atexit.register(self.close)
+
+    def backoff(self):
+        """فاصله تا تلاش بعدی؛ بعد از هر flush ناموفق پشت سر هم دو برابر می‌شود"""
+        if not self._failures:
+            return self.interval
+        return min(self.interval * 2 ** self._failures, self.max_backoff)
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.backoff())
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('write-behind flush failed')
+
+    def flush(self):
+        """نوشتن آیتم‌های صف؛ خروجی تعداد آیتم‌های نوشته‌شده"""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._items = self._items, []
+            if not entries:
+                return 0
+            retry, failed = [], []
+            written = self._write(entries, retry, failed)
+            if retry:
+                # برگرداندن آیتم‌ها به ابتدای صف برای تلاش دوباره
+                with self._lock:
+                    self._items[:0] = retry
+                self._failures += 1
+            else:
+                self._failures = 0
+            if failed:
+                self._spill(failed)
+            return written
+
+    def _write(self, entries, retry, failed):
+        try:
+            self.flush_func([item for item, _ in entries])
+            return len(entries)
+        except self.permanent_errors:
+            if len(entries) > 1:
+                middle = len(entries) // 2
+                return self._write(entries[:middle], retry, failed) + self._write(entries[middle:], retry, failed)
+            logger.exception('write-behind item rejected: %s', self._describe(entries[0][0]))
+            failed.append(entries[0][0])
+            return 0
+        except Exception:
+            logger.exception('write-behind flush failed; %d items kept for retry', len(entries))
+            for item, attempts in entries:
+                if attempts + 1 >= self.max_attempts:
+                    failed.append(item)
+                else:
+                    retry.append((item, attempts + 1))
+            return 0
+
+    def _spill(self, items):
+        if self.spill is not None:
+            try:
+                self.spill(items)
+                return
+            except Exception:
+                logger.exception('write-behind spill failed')
+        # آخرین راه: ثبت کامل آیتم‌ها در لاگ
+        for item in items:
+            logger.error('write-behind item not written: %s', self._describe(item))
+
+    def _describe(self, item):
+        try:
+            return self.describe(item)
+        except Exception:
+            return object.__repr__(item)
+
+    def close(self):
+        """
+        توقف thread و نوشتن همه آیتم‌های باقی‌مانده؛ تا close_timeout ثانیه با فاصله رو به افزایش
+        تلاش می‌شود و آیتم‌هایی که باز هم نوشته نشوند به spill داده می‌شوند.
+        """
+        with self._lock:
+            self._closed = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(self.interval + 5)
+        deadline = time.monotonic() + self.close_timeout
+        delay = min(self.interval, 0.1)
+        while self._items:
+            self.flush()
+            remaining = deadline - time.monotonic()
+            if not self._items or remaining <= 0:
+                break
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, self.max_backoff)
+        with self._lock:
+            entries, self._items = self._items, []
+        if entries:
+            logger.error('write-behind buffer closed with %d unwritten items', len(entries))
+            self._spill([item for item, _ in entries])
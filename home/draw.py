@@ -0,0 +1,67 @@
+import random
+import secrets
+
+from . import bitmap
+from .models import CorrectResponderBitmap, PrizeDraw, Question
+
+BLOCK_SIZE = 8192
+
+
+def select_ranks(data, ranks):
+    """
+    آیدی کاربرانی که در رتبه‌های داده‌شده (مرتب صعودی) بین بیت‌های روشن bitmap قرار دارند.
+    بلوک‌هایی که رتبه‌ای در آن‌ها نیست فقط با شمارش بیت‌ها رد می‌شوند.
+    """
+    ranks = iter(ranks)
+    target = next(ranks, None)
+    seen = 0
+    for start in range(0, len(data), BLOCK_SIZE):
+        if target is None:
+            break
+        block = data[start:start + BLOCK_SIZE]
+        count = int.from_bytes(block, 'little').bit_count()
+        if target >= seen + count:
+            seen += count
+            continue
+        for offset, byte in enumerate(block):
+            count = byte.bit_count()
+            while target is not None and target < seen + count:
+                # پیدا کردن (target - seen)اُمین بیت روشن در این بایت
+                remaining = byte
+                for _ in range(target - seen):
+                    remaining &= remaining - 1
+                yield (start + offset) * 8 + (remaining & -remaining).bit_length() - 1
+                target = next(ranks, None)
+            seen += count
+
+
+def draw_winners(question_id, count, seed=None, user=None):
+    """
+    انتخاب یکنواخت count برنده از بین پاسخ‌دهندگان درست بدون ساختن لیست کامل آن‌ها.
+    با همان seed و همان bitmap همیشه همان برندگان انتخاب می‌شوند.
+    """
+    row = CorrectResponderBitmap.objects.filter(question_id=question_id).first()
+    archived = Question.objects.filter(pk=question_id, is_archived=True).exists()
+    # bitmap با تأخیر و از صف جداگانه هر پروسه نوشته می‌شود و ممکن است عقب باشد یا آیتمی را از دست داده باشد؛
+    # برای سوال بایگانی‌نشده همیشه و برای سوال بایگانی‌شده با تفاوت تعداد، از روی پاسخ‌ها ساخته می‌شود
+    if row is None or not archived or row.cardinality != bitmap.count_correct_responses(question_id):
+        bitmap.rebuild(question_id)
+        row = CorrectResponderBitmap.objects.get(question_id=question_id)
+    data = bitmap.decode(row.bitmap)
+    candidates = row.cardinality
+
+    seed = str(seed if seed is not None else secrets.randbits(64))
+    rng = random.Random(seed)
+    sample = rng.sample(range(candidates), min(count, candidates))
+    ranks = sorted(sample)
+    user_ids = dict(zip(ranks, select_ranks(data, ranks)))
+    # ترتیب برندگان همان ترتیب انتخاب تصادفی است
+    winners = [user_ids[rank] for rank in sample]
+
+    return PrizeDraw.objects.create(
+        question_id=question_id,
+        seed=seed,
+        candidates_count=candidates,
+        winners=winners,
+        created_by=user,
+    )
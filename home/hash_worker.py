@@ -0,0 +1,26 @@
+"""
+توابعی که در پروسه‌های pool هش اجرا می‌شوند.
+این ماژول نباید مدل‌ها را import کند؛ با spawn پیش از django.setup بارگذاری می‌شود.
+"""
+import time
+
+from django.contrib.auth.hashers import check_password, make_password
+
+
+def init_worker():
+    import django
+    django.setup()
+
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def make(password):
+    return _timed(make_password, password)
+
+
+def check(password, encoded):
+    return _timed(check_password, password, encoded)
@@ -0,0 +1,205 @@
+import asyncio
+import atexit
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, identify_hasher
+
+from . import hash_worker
+from .models import User
+
+
+class HashingBusy(Exception):
+    """صف هش رمز عبور پر است؛ درخواست باید بعداً تکرار شود"""
+
+
+class HashMetrics:
+    """تعداد کارهای در صف، خطاها و زمان هش (داخل پروسه کارگر) و کل زمان انتظار درخواست"""
+
+    def __init__(self, samples=1000):
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.hash_times = deque(maxlen=samples)
+        self.total_times = deque(maxlen=samples)
+
+    def started(self):
+        with self._lock:
+            self.pending += 1
+
+    def finished(self, hash_time, total_time):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+            if hash_time is not None:
+                self.hash_times.append(hash_time)
+            self.total_times.append(total_time)
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    @staticmethod
+    def _summary(samples):
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return {
+            'avg': round(sum(ordered) / len(ordered) * 1000, 2),
+            'p50': round(ordered[len(ordered) // 2] * 1000, 2),
+            'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+            'max': round(ordered[-1] * 1000, 2),
+        }
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'workers': pool_size(),
+                'max_pending': max_pending(),
+                'queue_depth': self.pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'hash_ms': self._summary(self.hash_times),
+                'total_ms': self._summary(self.total_times),
+            }
+
+
+metrics = HashMetrics()
+
+
+def pool_size():
+    # صفر یعنی هش در همان thread درخواست انجام شود
+    return getattr(settings, 'PASSWORD_HASH_WORKERS', 2)
+
+
+def max_pending():
+    return getattr(settings, 'PASSWORD_HASH_MAX_PENDING', 32)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+
+
+def _get_pool():
+    global _pool, _slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _slots = threading.BoundedSemaphore(max_pending())
+                # spawn به جای fork: پروسه اصلی threadهای پس‌زمینه و اتصال دیتابیس دارد
+                _pool = ProcessPoolExecutor(
+                    max_workers=pool_size(),
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=hash_worker.init_worker,
+                )
+                atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+    return _pool
+
+
+def _submit(func, args, wait):
+    """ارسال کار به pool با محدودیت تعداد کارهای در انتظار (back-pressure)"""
+    pool = _get_pool()
+    if wait:
+        acquired = _slots.acquire(timeout=getattr(settings, 'PASSWORD_HASH_QUEUE_TIMEOUT', 2))
+    else:
+        acquired = _slots.acquire(blocking=False)
+    if not acquired:
+        metrics.reject()
+        raise HashingBusy()
+    started = time.perf_counter()
+    metrics.started()
+    try:
+        future = pool.submit(func, *args)
+    except Exception:
+        _slots.release()
+        metrics.finished(None, time.perf_counter() - started)
+        raise
+
+    def done(future):
+        _slots.release()
+        hash_time = future.result()[1] if not future.cancelled() and future.exception() is None else None
+        metrics.finished(hash_time, time.perf_counter() - started)
+
+    future.add_done_callback(done)
+    return future
+
+
+def _run(func, *args):
+    if not pool_size():
+        started = time.perf_counter()
+        metrics.started()
+        result, hash_time = func(*args)
+        metrics.finished(hash_time, time.perf_counter() - started)
+        return result
+    return _submit(func, args, wait=True).result()[0]
+
+
+async def _arun(func, *args):
+    if not pool_size():
+        return _run(func, *args)
+    # در مسیر async منتظر جای خالی نمی‌مانیم تا event loop مسدود نشود
+    result, _ = await asyncio.wrap_future(_submit(func, args, wait=False))
+    return result
+
+
+def hash_password(password):
+    return _run(hash_worker.make, password)
+
+
+def verify_password(password, encoded):
+    return _run(hash_worker.check, password, encoded)
+
+
+async def ahash_password(password):
+    return await _arun(hash_worker.make, password)
+
+
+async def averify_password(password, encoded):
+    return await _arun(hash_worker.check, password, encoded)
+
+
+def must_update(encoded):
+    """آیا هش ذخیره‌شده باید با الگوریتم یا تعداد تکرار فعلی دوباره ساخته شود؟"""
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    return hasher.algorithm != get_hasher('default').algorithm or hasher.must_update(encoded)
+
+
+def _check_user(user, valid):
+    return user if valid and user.is_active else None
+
+
+def authenticate_user(phone_number, password):
+    """
+    معادل authenticate() با هش رمز عبور در pool.
+    برای شماره ناموجود هم یک هش انجام می‌شود تا زمان پاسخ وجود حساب را لو ندهد.
+    """
+    user = User.objects.filter(phone_number=phone_number).first()
+    if user is None:
+        hash_password(password)
+        return None
+    valid = verify_password(password, user.password)
+    if valid and must_update(user.password):
+        user.password = hash_password(password)
+        user.save(update_fields=['password'])
+    return _check_user(user, valid)
+
+
+async def aauthenticate_user(phone_number, password):
+    user = await User.objects.filter(phone_number=phone_number).afirst()
+    if user is None:
+        await ahash_password(password)
+        return None
+    valid = await averify_password(password, user.password)
+    if valid and must_update(user.password):
+        user.password = await ahash_password(password)
+        await user.asave(update_fields=['password'])
+    return _check_user(user, valid)
@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import socket
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from . import bitmap
+from .buffers import WriteBehindBuffer
+from .leaderboard import add_correct_answers
+from .models import UserResponse
+from .stats import record_user_answers
+from .submission import ALREADY_ANSWERED, CorrectResponder, SubmissionError, resolve_choice, submit_response
+
+logger = logging.getLogger(__name__)
+
+DIRECT = 'direct'
+BUFFERED = 'buffered'
+
+# کلید کش مشترک برای رد پاسخ تکراری پیش از جواب دادن به کاربر در حالت buffered
+ANSWERED_KEY = 'home:answered:{}:{}'
+
+
+def insert_responses(responses):
+    """
+    درج پاسخ‌ها؛ خروجی فقط پاسخ‌هایی که واقعاً درج شدند.
+    اگر پروسه دیگری همزمان همان پاسخ را ثبت کرده باشد، پاسخ‌ها جداگانه (هر کدام در savepoint) درج می‌شوند.
+    """
+    try:
+        with transaction.atomic():
+            UserResponse.objects.bulk_create(responses)
+        return responses
+    except IntegrityError:
+        inserted = []
+        for response in responses:
+            try:
+                with transaction.atomic():
+                    UserResponse.objects.bulk_create([response])
+            except IntegrityError:
+                continue
+            inserted.append(response)
+        return inserted
+
+
+def flush_responses(responses):
+    """نوشتن یک دسته UserResponse با bulk_create؛ پاسخ‌هایی که قبلاً ثبت شده‌اند کنار گذاشته می‌شوند"""
+    with transaction.atomic():
+        existing = set(
+            UserResponse.objects.filter(
+                question_id__in={r.question_id for r in responses},
+                user_id__in={r.user_id for r in responses},
+            ).values_list('user_id', 'question_id')
+        )
+        fresh = []
+        for response in responses:
+            key = (response.user_id, response.question_id)
+            if key in existing:
+                continue
+            existing.add(key)
+            fresh.append(response)
+
+        # آمار و امتیاز فقط برای ردیف‌های درج‌شده؛ ردیف ثبت‌شده توسط پروسه دیگر دو بار شمرده نمی‌شود
+        fresh = insert_responses(fresh) if fresh else []
+        record_user_answers(fresh)
+        correct = [r for r in fresh if r.is_correct]
+        CorrectResponder.objects.bulk_create(
+            [CorrectResponder(question_id=r.question_id, user_id=r.user_id) for r in correct],
+            ignore_conflicts=True,
+        )
+        add_correct_answers([r.user_id for r in correct])
+        for question_id in {r.question_id for r in correct}:
+            bitmap.mark_correct(question_id, [r.user_id for r in correct if r.question_id == question_id])
+
+
+SPOOL_FIELDS = ('user_id', 'question_id', 'selected_choice_id', 'is_correct')
+
+
+def spool_dir():
+    return Path(getattr(settings, 'RESPONSE_SPOOL_DIR', settings.BASE_DIR / 'spool'))
+
+
+def spool_responses(responses):
+    """
+    ذخیره پاسخ‌هایی که در دیتابیس نوشته نشدند در فایل (هر پروسه فایل خودش)؛
+    با manage.py replay_responses دوباره ثبت می‌شوند.
+    """
+    directory = spool_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"responses-{socket.gethostname()}-{os.getpid()}.jsonl"
+    with open(path, 'a', encoding='utf-8') as spool:
+        for response in responses:
+            spool.write(json.dumps({field: getattr(response, field) for field in SPOOL_FIELDS}) + '\n')
+        spool.flush()
+        os.fsync(spool.fileno())
+    logger.error('%d responses spooled to %s', len(responses), path)
+
+
+def replay_spooled_responses(batch_size=500):
+    """ثبت دوباره پاسخ‌های فایل‌های spool؛ خروجی تعداد پاسخ‌های خوانده‌شده"""
+    directory = spool_dir()
+    if not directory.exists():
+        return 0
+    count = 0
+    for path in sorted(directory.glob('responses-*.jsonl')):
+        # تغییر نام پیش از خواندن تا پروسه‌ای که هنوز می‌نویسد فایل جدید بسازد
+        replaying = path.with_suffix('.replaying')
+        path.rename(replaying)
+        count += _replay(replaying, batch_size)
+    for path in sorted(directory.glob('responses-*.replaying')):
+        count += _replay(path, batch_size)
+    return count
+
+
+def _replay(path, batch_size):
+    if not path.exists():
+        return 0
+    with open(path, encoding='utf-8') as spool:
+        responses = [UserResponse(**json.loads(line)) for line in spool if line.strip()]
+    for start in range(0, len(responses), batch_size):
+        flush_responses(responses[start:start + batch_size])
+    path.unlink()
+    return len(responses)
+
+
+def describe_response(response):
+    # __str__ پاسخ کوئری می‌زند و برای سوال حذف‌شده خطا می‌دهد
+    return f"user={response.user_id} question={response.question_id} choice={response.selected_choice_id}"
+
+
+class ResponseBuffer:
+    """ثبت پاسخ با تأیید فوری و نوشتن دسته‌ای در دیتابیس"""
+
+    def __init__(self, max_size, interval):
+        self.buffer = WriteBehindBuffer(
+            flush_responses, max_size, interval, getattr(settings, 'WRITE_BEHIND_MAX_ATTEMPTS', 30),
+            describe=describe_response,
+            spill=spool_responses,
+            close_timeout=getattr(settings, 'WRITE_BEHIND_CLOSE_TIMEOUT', 10),
+        )
+
+    def submit(self, user, selected_choice_id):
+        snapshot, choice_id, is_correct = resolve_choice(selected_choice_id)
+
+        # یکتایی (سوال، کاربر) در کش مشترک؛ با مجموعه داخل پروسه کاربر می‌توانست هر گزینه را
+        # به پروسه دیگری بفرستد و درست بودن همه را ببیند
+        key = ANSWERED_KEY.format(snapshot.question_id, user.pk)
+        if not cache.add(key, True, getattr(settings, 'RESPONSE_DEDUP_TTL', 24 * 3600)):
+            raise SubmissionError(ALREADY_ANSWERED)
+
+        self.buffer.add(UserResponse(
+            user_id=user.pk,
+            question_id=snapshot.question_id,
+            selected_choice_id=choice_id,
+            is_correct=is_correct,
+        ))
+        return is_correct
+
+
+_response_buffer = None
+_response_buffer_lock = threading.Lock()
+
+
+def get_response_buffer():
+    global _response_buffer
+    if _response_buffer is None:
+        with _response_buffer_lock:
+            if _response_buffer is None:
+                _response_buffer = ResponseBuffer(
+                    getattr(settings, 'RESPONSE_BUFFER_MAX_SIZE', 500),
+                    getattr(settings, 'RESPONSE_BUFFER_FLUSH_INTERVAL', 1.0),
+                )
+    return _response_buffer
+
+
+def ingest_response(user, selected_choice_id):
+    """ثبت پاسخ بر اساس RESPONSE_INGESTION_MODE (direct یا buffered)"""
+    if getattr(settings, 'RESPONSE_INGESTION_MODE', DIRECT) == BUFFERED:
+        return get_response_buffer().submit(user, selected_choice_id)
+    return submit_response(user, selected_choice_id)
@@ -0,0 +1,72 @@
+import os
+import socket
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import SchedulerLock
+
+LOCK_NAME = 'scheduler'
+
+# تابع زمان‌بندی دوباره در پروسه‌ای که شِدولر در آن اجرا می‌شود
+_local_rearm = None
+
+
+def make_owner_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def lease_timeout():
+    return timedelta(seconds=getattr(settings, 'SCHEDULER_LEASE_TIMEOUT', 30))
+
+
+def try_acquire(owner):
+    """گرفتن یا تمدید قفل رهبری؛ اگر پروسه دیگری رهبر باشد False"""
+    now = timezone.now()
+    updated = SchedulerLock.objects.filter(name=LOCK_NAME).filter(
+        Q(owner=owner) | Q(heartbeat_at__lt=now - lease_timeout())
+    ).update(owner=owner, heartbeat_at=now)
+    if updated:
+        return True
+
+    try:
+        with transaction.atomic():
+            SchedulerLock.objects.create(name=LOCK_NAME, owner=owner, heartbeat_at=now)
+    except IntegrityError:
+        return False
+    return True
+
+
+def release(owner):
+    SchedulerLock.objects.filter(name=LOCK_NAME, owner=owner).delete()
+
+
+def pop_rearm_request(owner, since):
+    """زمان آخرین درخواست زمان‌بندی دوباره اگر بعد از since ثبت شده باشد"""
+    requested_at = SchedulerLock.objects.filter(name=LOCK_NAME, owner=owner).values_list(
+        'rearm_requested_at', flat=True
+    ).first()
+    if requested_at and (since is None or requested_at > since):
+        return requested_at
+    return None
+
+
+def set_local_rearm(func):
+    global _local_rearm
+    _local_rearm = func
+
+
+def request_rotation_rearm():
+    """
+    درخواست زمان‌بندی دوباره چرخش سوال‌ها.
+    در پروسه رهبر مستقیم اجرا می‌شود و در بقیه پروسه‌ها روی ردیف قفل ثبت می‌شود
+    تا رهبر در heartbeat بعدی آن را ببیند.
+    """
+    if _local_rearm is not None:
+        _local_rearm()
+        return
+    SchedulerLock.objects.filter(name=LOCK_NAME).update(rearm_requested_at=timezone.now())
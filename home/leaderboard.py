@@ -0,0 +1,114 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from .models import ArchivedResponse, User, UserResponse, UserScore
+from .transactions import retry_on_conflict, snapshot_atomic
+
+
+def add_correct_answers(user_ids):
+    """
+    افزایش امتیاز کاربران به ازای هر پاسخ درست.
+    باید داخل همان تراکنشی صدا زده شود که پاسخ‌ها را ثبت می‌کند.
+    """
+    counts = Counter(user_ids)
+    missing = [
+        user_id for user_id, count in counts.items()
+        if not UserScore.objects.filter(user_id=user_id).update(correct_count=F('correct_count') + count)
+    ]
+    if not missing:
+        return
+
+    for user in User.objects.filter(pk__in=missing).only('id', 'province', 'gender'):
+        try:
+            with transaction.atomic():
+                UserScore.objects.create(
+                    user_id=user.pk,
+                    correct_count=counts[user.pk],
+                    province=user.province,
+                    gender=user.gender,
+                )
+        except IntegrityError:
+            # ردیف همزمان توسط درخواست دیگری ساخته شده است
+            UserScore.objects.filter(user_id=user.pk).update(correct_count=F('correct_count') + counts[user.pk])
+
+
+def scores(province=None, gender=None):
+    queryset = UserScore.objects.all()
+    if province:
+        queryset = queryset.filter(province=province)
+    if gender:
+        queryset = queryset.filter(gender=gender)
+    return queryset
+
+
+def top(limit, province=None, gender=None):
+    """n کاربر برتر؛ ترتیب با ایندکس‌های (-correct_count, user) پشتیبانی می‌شود"""
+    return scores(province, gender).select_related('user').order_by('-correct_count', 'user_id')[:limit]
+
+
+def rank_of(user_id, province=None, gender=None):
+    """
+    رتبه و امتیاز کاربر در محدوده انتخاب‌شده؛ اگر امتیازی نداشته باشد None.
+    شمارش کاربران جلوتر روی ایندکس (-correct_count, user) انجام می‌شود و هزینه آن با رتبه کاربر
+    (نه کل جدول) رشد می‌کند؛ برای کاربران انتهای جدول‌های بسیار بزرگ کند است.
+    """
+    queryset = scores(province, gender)
+    correct_count = queryset.filter(user_id=user_id).values_list('correct_count', flat=True).first()
+    if correct_count is None:
+        return None
+    ahead = queryset.filter(
+        Q(correct_count__gt=correct_count) | Q(correct_count=correct_count, user_id__lt=user_id)
+    ).count()
+    return ahead + 1, correct_count
+
+
+def _rebuild_batch(users):
+    user_ids = [user[0] for user in users]
+    # شمارش پاسخ‌ها و خواندن امتیازها از یک snapshot؛ فقط اختلاف‌ها نوشته می‌شوند تا
+    # امتیازی که همزمان با add_correct_answers اضافه شده پاک نشود (تداخل: خطا و اجرای دوباره)
+    with snapshot_atomic():
+        counts = Counter()
+        for model in (UserResponse, ArchivedResponse):
+            rows = model.objects.filter(user_id__in=user_ids, is_correct=True).values('user_id').annotate(
+                total=Count('id')
+            ).values_list('user_id', 'total').order_by()
+            counts.update(dict(rows))
+
+        current = {
+            user_id: (correct_count, province, gender)
+            for user_id, correct_count, province, gender in UserScore.objects.filter(
+                user_id__in=user_ids
+            ).values_list('user_id', 'correct_count', 'province', 'gender')
+        }
+        stale = [pk for pk, _, _ in users if pk in current and not counts[pk]]
+        if stale:
+            UserScore.objects.filter(user_id__in=stale).delete()
+        missing = []
+        for pk, province, gender in users:
+            if not counts[pk] or current.get(pk) == (counts[pk], province, gender):
+                continue
+            if pk in current:
+                UserScore.objects.filter(user_id=pk).update(
+                    correct_count=counts[pk], province=province, gender=gender
+                )
+            else:
+                missing.append(UserScore(user_id=pk, correct_count=counts[pk], province=province, gender=gender))
+        UserScore.objects.bulk_create(missing)
+
+
+def rebuild_scores(batch_size=1000):
+    """محاسبه دوباره جدول امتیازها از UserResponse و ArchivedResponse به صورت دسته‌ای"""
+    last_id = 0
+    rebuilt = 0
+    while True:
+        users = list(
+            User.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', 'province', 'gender')[:batch_size]
+        )
+        if not users:
+            break
+        last_id = users[-1][0]
+        retry_on_conflict(_rebuild_batch, users)
+        rebuilt += len(users)
+    return rebuilt
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from home.archive import archive_pending
+
+
+class Command(BaseCommand):
+    help = 'انتقال پاسخ‌های باقی‌مانده سوالات بایگانی‌شده به جدول بایگانی'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None, help='تعداد ردیف‌های هر تکه')
+
+    def handle(self, *args, **options):
+        moved = archive_pending(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'{moved} responses archived'))
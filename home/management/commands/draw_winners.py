@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from home.draw import draw_winners
+
+
+class Command(BaseCommand):
+    help = 'قرعه‌کشی بین پاسخ‌دهندگان درست یک سوال'
+
+    def add_arguments(self, parser):
+        parser.add_argument('question_id', type=int, help='آیدی سوال')
+        parser.add_argument('--count', type=int, default=10, help='تعداد برندگان')
+        parser.add_argument('--seed', default=None, help='seed برای تکرار یک قرعه‌کشی قبلی')
+
+    def handle(self, *args, **options):
+        prize_draw = draw_winners(options['question_id'], options['count'], seed=options['seed'])
+        self.stdout.write(f'seed: {prize_draw.seed}')
+        self.stdout.write(f'candidates: {prize_draw.candidates_count}')
+        self.stdout.write(self.style.SUCCESS(f'winners: {prize_draw.winners}'))
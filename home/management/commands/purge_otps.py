@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from home import sms
+from home.otp import ModelOTPStore
+
+
+class Command(BaseCommand):
+    help = 'حذف کدهای تأیید منقضی‌شده از جدول PhoneOTP و پیامک‌های قدیمی ارسال‌شده یا ناموفق'
+
+    def handle(self, *args, **options):
+        deleted = ModelOTPStore().purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'{deleted} expired OTP rows deleted'))
+        deleted = sms.purge_finished()
+        self.stdout.write(self.style.SUCCESS(f'{deleted} finished SMS rows deleted'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from home import bitmap
+from home.models import Question
+
+
+class Command(BaseCommand):
+    help = 'ساخت دوباره bitmap کاربران با پاسخ درست از روی پاسخ‌ها (پیش‌فرض: همه سوالات)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('question_ids', nargs='*', type=int, help='آیدی سوالات')
+
+    def handle(self, *args, **options):
+        question_ids = options['question_ids'] or list(Question.objects.values_list('id', flat=True))
+        for question_id in question_ids:
+            cardinality = bitmap.rebuild(question_id)
+            self.stdout.write(self.style.SUCCESS(f'question {question_id}: {cardinality} correct responders'))
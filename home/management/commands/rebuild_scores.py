@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from home.leaderboard import rebuild_scores
+
+
+class Command(BaseCommand):
+    help = 'محاسبه دوباره جدول امتیاز کاربران از روی پاسخ‌ها'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='تعداد کاربران هر دسته')
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_scores(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'scores rebuilt for {rebuilt} users'))
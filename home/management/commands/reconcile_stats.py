@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from home.models import Question
+from home.stats import reconcile_question
+
+
+class Command(BaseCommand):
+    help = 'اصلاح شمارنده‌های آمار پاسخ از روی پاسخ‌های ثبت‌شده (پیش‌فرض: سوال فعال)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('question_ids', nargs='*', type=int, help='آیدی سوالات')
+
+    def handle(self, *args, **options):
+        question_ids = options['question_ids'] or list(Question.objects.active().values_list('id', flat=True))
+        for question_id in question_ids:
+            count = reconcile_question(question_id)
+            self.stdout.write(self.style.SUCCESS(f'question {question_id}: {count} counters reconciled'))
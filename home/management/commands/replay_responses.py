@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from home.ingestion import replay_spooled_responses, spool_dir
+
+
+class Command(BaseCommand):
+    help = 'ثبت دوباره پاسخ‌هایی که صف buffered نتوانست در دیتابیس بنویسد و در فایل spool ذخیره کرد'
+
+    def handle(self, *args, **options):
+        count = replay_spooled_responses()
+        self.stdout.write(self.style.SUCCESS(f'{count} spooled responses replayed from {spool_dir()}'))
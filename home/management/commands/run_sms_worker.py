@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from home import sms
+
+
+class Command(BaseCommand):
+    help = 'ارسال دسته‌ای پیامک‌های صف از طریق درگاه SMS_GATEWAY'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='فاصله بررسی صف خالی (ثانیه)')
+        parser.add_argument('--once', action='store_true', help='فقط یک دسته ارسال شود')
+
+    def handle(self, *args, **options):
+        gateway = sms.get_gateway()
+        try:
+            while True:
+                processed = sms.process_batch(gateway)
+                if options['once']:
+                    break
+                if not processed:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
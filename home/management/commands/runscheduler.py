@@ -0,0 +1,55 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from home import leader
+from home.question_cache import is_shared_cache
+
+
+class Command(BaseCommand):
+    help = 'اجرای شِدولر سوالات؛ با قفل دیتابیسی فقط یک نمونه در هر لحظه jobها را اجرا می‌کند'
+
+    def handle(self, *args, **options):
+        # چرخش سوال از طریق کش به پروسه‌های وب اطلاع داده می‌شود؛ کش محلی پروسه یا DatabaseCache کافی نیست
+        if not is_shared_cache():
+            raise CommandError('runscheduler needs Redis or Memcached as the default cache; set REDIS_URL or CACHES')
+
+        # import داخلی تا پروسه‌های وب APScheduler را بارگذاری نکنند
+        from home.apscheduler import arm_rotation, start_scheduler, stop_scheduler
+
+        interval = getattr(settings, 'SCHEDULER_HEARTBEAT_INTERVAL', 5)
+        owner = leader.make_owner_id()
+        is_leader = False
+        last_rearm = None
+
+        # SIGTERM مثل Ctrl+C باعث خروج تمیز و آزاد شدن قفل می‌شود
+        signal.signal(signal.SIGTERM, signal.getsignal(signal.SIGINT))
+        self.stdout.write(f'scheduler worker {owner} started')
+
+        try:
+            while True:
+                if leader.try_acquire(owner):
+                    if not is_leader:
+                        is_leader = True
+                        last_rearm = None
+                        start_scheduler()
+                        self.stdout.write(self.style.SUCCESS('acquired scheduler leadership'))
+                    else:
+                        requested_at = leader.pop_rearm_request(owner, last_rearm)
+                        if requested_at:
+                            last_rearm = requested_at
+                            arm_rotation()
+                elif is_leader:
+                    is_leader = False
+                    stop_scheduler()
+                    self.stdout.write(self.style.WARNING('lost scheduler leadership'))
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if is_leader:
+                stop_scheduler()
+                leader.release(owner)
+            self.stdout.write('scheduler worker stopped')
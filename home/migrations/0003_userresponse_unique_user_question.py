@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+def remove_duplicate_responses(apps, schema_editor):
+    # نگه داشتن اولین پاسخ هر کاربر به هر سوال قبل از ساخت قید یکتا
+    UserResponse = apps.get_model('home', 'UserResponse')
+    duplicates = (
+        UserResponse.objects.values('user_id', 'question_id')
+        .annotate(first_id=models.Min('id'), total=models.Count('id'))
+        .filter(total__gt=1)
+    )
+    for row in duplicates.iterator():
+        UserResponse.objects.filter(
+            user_id=row['user_id'], question_id=row['question_id']
+        ).exclude(id=row['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0002_aboutus'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_responses, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='userresponse',
+            constraint=models.UniqueConstraint(fields=('user', 'question'), name='unique_user_response_per_question'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0003_userresponse_unique_user_question'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchedulerLock',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('owner', models.CharField(max_length=255)),
+                ('heartbeat_at', models.DateTimeField()),
+                ('rearm_requested_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0004_schedulerlock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='is_archived',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='بایگانی شده'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_correct', models.BooleanField(default=False, verbose_name='آیا پاسخ درست است؟')),
+                ('question', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='home.question', verbose_name='سوال')),
+                ('selected_choice', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='home.choice', verbose_name='گزینه انتخاب شده')),
+                ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+            ],
+            options={
+                'verbose_name': 'پاسخ بایگانی\u200cشده',
+                'verbose_name_plural': 'پاسخ\u200cهای بایگانی\u200cشده',
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+def keep_single_active_question(apps, schema_editor):
+    # فقط نزدیک‌ترین سوال به انقضا فعال می‌ماند
+    Question = apps.get_model('home', 'Question')
+    active = Question.objects.filter(is_active=True).order_by('expiry_date', 'id').first()
+    if active:
+        Question.objects.filter(is_active=True).exclude(pk=active.pk).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0005_archivedresponse_question_is_archived'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_single_active_question, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='question',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('is_active',), name='single_active_question'),
+        ),
+    ]
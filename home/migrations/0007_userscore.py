@@ -0,0 +1,29 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0006_question_single_active_question'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserScore',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+                ('correct_count', models.PositiveIntegerField(default=0, verbose_name='تعداد پاسخ درست')),
+                ('province', models.CharField(max_length=50, verbose_name='استان')),
+                ('gender', models.CharField(choices=[('M', 'مرد'), ('F', 'زن')], max_length=1, verbose_name='جنسیت')),
+            ],
+            options={
+                'verbose_name': 'امتیاز کاربر',
+                'verbose_name_plural': 'امتیاز کاربران',
+                'indexes': [models.Index(fields=['-correct_count', 'user'], name='score_rank_idx'), models.Index(fields=['province', '-correct_count', 'user'], name='score_province_rank_idx'), models.Index(fields=['gender', '-correct_count', 'user'], name='score_gender_rank_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0007_userscore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('choice', 'گزینه'), ('province', 'استان'), ('gender', 'جنسیت')], max_length=10, verbose_name='بُعد')),
+                ('key', models.CharField(max_length=50, verbose_name='مقدار')),
+                ('shard', models.PositiveSmallIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='تعداد پاسخ')),
+                ('correct', models.PositiveIntegerField(default=0, verbose_name='تعداد پاسخ درست')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_stats', to='home.question', verbose_name='سوال')),
+            ],
+            options={
+                'verbose_name': 'آمار پاسخ',
+                'verbose_name_plural': 'آمار پاسخ\u200cها',
+                'constraints': [models.UniqueConstraint(fields=('question', 'dimension', 'key', 'shard'), name='unique_answer_stat')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0008_answerstat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorrectResponderBitmap',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='correct_bitmap', serialize=False, to='home.question', verbose_name='سوال')),
+                ('bitmap', models.BinaryField(default=b'')),
+                ('cardinality', models.PositiveIntegerField(default=0, verbose_name='تعداد کاربران')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'بیت\u200cمپ پاسخ\u200cدهندگان درست',
+                'verbose_name_plural': 'بیت\u200cمپ\u200cهای پاسخ\u200cدهندگان درست',
+            },
+        ),
+    ]
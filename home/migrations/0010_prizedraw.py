@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0009_correctresponderbitmap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrizeDraw',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seed', models.CharField(max_length=64, verbose_name='seed')),
+                ('candidates_count', models.PositiveIntegerField(verbose_name='تعداد شرکت\u200cکنندگان')),
+                ('winners', models.JSONField(default=list, verbose_name='آیدی برندگان')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ قرعه\u200cکشی')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='انجام\u200cدهنده')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prize_draws', to='home.question', verbose_name='سوال')),
+            ],
+            options={
+                'verbose_name': 'قرعه\u200cکشی',
+                'verbose_name_plural': 'قرعه\u200cکشی\u200cها',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:08
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0010_prizedraw'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundSMS',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone_number', models.CharField(db_index=True, max_length=15, verbose_name='شماره موبایل')),
+                ('body', models.TextField(verbose_name='متن پیام')),
+                ('status', models.CharField(choices=[('pending', 'در صف ارسال'), ('sent', 'ارسال شده'), ('failed', 'ناموفق')], default='pending', max_length=10, verbose_name='وضعیت')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='تعداد تلاش')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='زمان تلاش بعدی')),
+                ('last_error', models.TextField(blank=True, verbose_name='آخرین خطا')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='تاریخ ارسال')),
+            ],
+            options={
+                'verbose_name': 'پیامک خروجی',
+                'verbose_name_plural': 'پیامک\u200cهای خروجی',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='sms_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0011_outboundsms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenRevocation',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+                ('revoked_at', models.DateTimeField(verbose_name='تاریخ ابطال')),
+            ],
+            options={
+                'verbose_name': 'ابطال توکن',
+                'verbose_name_plural': 'ابطال توکن\u200cها',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0012_tokenrevocation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['user', '-created_at'], name='ticket_user_created_idx'),
+        ),
+    ]
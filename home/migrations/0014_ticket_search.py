@@ -0,0 +1,119 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:05
+
+from django.db import migrations
+
+# شناسه سند در ایندکس: تیکت = id * 2، پاسخ = id * 2 + 1
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE home_ticket_fts USING fts5(ticket_id UNINDEXED, content, tokenize='unicode61 remove_diacritics 2')",
+    """CREATE TRIGGER home_ticket_fts_ai AFTER INSERT ON home_ticket BEGIN
+        INSERT INTO home_ticket_fts(rowid, ticket_id, content) VALUES (new.id * 2, new.id, new.subject || ' ' || new.body);
+    END""",
+    """CREATE TRIGGER home_ticket_fts_au AFTER UPDATE OF subject, body ON home_ticket BEGIN
+        DELETE FROM home_ticket_fts WHERE rowid = old.id * 2;
+        INSERT INTO home_ticket_fts(rowid, ticket_id, content) VALUES (new.id * 2, new.id, new.subject || ' ' || new.body);
+    END""",
+    """CREATE TRIGGER home_ticket_fts_ad AFTER DELETE ON home_ticket BEGIN
+        DELETE FROM home_ticket_fts WHERE rowid = old.id * 2;
+    END""",
+    """CREATE TRIGGER home_ticketreply_fts_ai AFTER INSERT ON home_ticketreply BEGIN
+        INSERT INTO home_ticket_fts(rowid, ticket_id, content) VALUES (new.id * 2 + 1, new.ticket_id, new.reply_body);
+    END""",
+    """CREATE TRIGGER home_ticketreply_fts_au AFTER UPDATE OF ticket_id, reply_body ON home_ticketreply BEGIN
+        DELETE FROM home_ticket_fts WHERE rowid = old.id * 2 + 1;
+        INSERT INTO home_ticket_fts(rowid, ticket_id, content) VALUES (new.id * 2 + 1, new.ticket_id, new.reply_body);
+    END""",
+    """CREATE TRIGGER home_ticketreply_fts_ad AFTER DELETE ON home_ticketreply BEGIN
+        DELETE FROM home_ticket_fts WHERE rowid = old.id * 2 + 1;
+    END""",
+    """INSERT INTO home_ticket_fts(rowid, ticket_id, content)
+        SELECT id * 2, id, subject || ' ' || body FROM home_ticket""",
+    """INSERT INTO home_ticket_fts(rowid, ticket_id, content)
+        SELECT id * 2 + 1, ticket_id, reply_body FROM home_ticketreply""",
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS home_ticket_fts_ai',
+    'DROP TRIGGER IF EXISTS home_ticket_fts_au',
+    'DROP TRIGGER IF EXISTS home_ticket_fts_ad',
+    'DROP TRIGGER IF EXISTS home_ticketreply_fts_ai',
+    'DROP TRIGGER IF EXISTS home_ticketreply_fts_au',
+    'DROP TRIGGER IF EXISTS home_ticketreply_fts_ad',
+    'DROP TABLE IF EXISTS home_ticket_fts',
+]
+
+POSTGRESQL_FORWARD = [
+    """CREATE TABLE home_ticket_search (
+        doc_id bigint PRIMARY KEY,
+        ticket_id bigint NOT NULL,
+        document tsvector NOT NULL
+    )""",
+    'CREATE INDEX home_ticket_search_document_idx ON home_ticket_search USING GIN (document)',
+    """CREATE FUNCTION home_ticket_search_ticket() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM home_ticket_search WHERE doc_id = OLD.id * 2;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO home_ticket_search VALUES (NEW.id * 2, NEW.id, to_tsvector('simple', NEW.subject || ' ' || NEW.body));
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE FUNCTION home_ticket_search_reply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM home_ticket_search WHERE doc_id = OLD.id * 2 + 1;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO home_ticket_search VALUES (NEW.id * 2 + 1, NEW.ticket_id, to_tsvector('simple', NEW.reply_body));
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE TRIGGER home_ticket_search_ticket AFTER INSERT OR DELETE OR UPDATE OF subject, body ON home_ticket
+        FOR EACH ROW EXECUTE FUNCTION home_ticket_search_ticket()""",
+    """CREATE TRIGGER home_ticket_search_reply AFTER INSERT OR DELETE OR UPDATE OF ticket_id, reply_body ON home_ticketreply
+        FOR EACH ROW EXECUTE FUNCTION home_ticket_search_reply()""",
+    """INSERT INTO home_ticket_search
+        SELECT id * 2, id, to_tsvector('simple', subject || ' ' || body) FROM home_ticket""",
+    """INSERT INTO home_ticket_search
+        SELECT id * 2 + 1, ticket_id, to_tsvector('simple', reply_body) FROM home_ticketreply""",
+]
+
+POSTGRESQL_BACKWARD = [
+    'DROP TRIGGER IF EXISTS home_ticket_search_ticket ON home_ticket',
+    'DROP TRIGGER IF EXISTS home_ticket_search_reply ON home_ticketreply',
+    'DROP FUNCTION IF EXISTS home_ticket_search_ticket()',
+    'DROP FUNCTION IF EXISTS home_ticket_search_reply()',
+    'DROP TABLE IF EXISTS home_ticket_search',
+]
+
+STATEMENTS = {
+    'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+    'postgresql': (POSTGRESQL_FORWARD, POSTGRESQL_BACKWARD),
+}
+
+
+def run_statements(schema_editor, index):
+    # روی دیتابیس‌های دیگر ایندکسی ساخته نمی‌شود و جستجو با icontains انجام می‌شود
+    statements = STATEMENTS.get(schema_editor.connection.vendor)
+    if statements:
+        for sql in statements[index]:
+            schema_editor.execute(sql, params=None)
+
+
+def create_search_index(apps, schema_editor):
+    run_statements(schema_editor, 0)
+
+
+def drop_search_index(apps, schema_editor):
+    run_statements(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0013_ticket_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
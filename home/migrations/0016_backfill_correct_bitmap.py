@@ -0,0 +1,38 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:40
+
+import zlib
+
+from django.db import migrations
+
+
+def backfill_bitmaps(apps, schema_editor):
+    # bitmap سوالاتی که پیش از 0009 پاسخ داشتند؛ منطق همان bitmap.rebuild (مدل‌های تاریخی)
+    Question = apps.get_model('home', 'Question')
+    UserResponse = apps.get_model('home', 'UserResponse')
+    ArchivedResponse = apps.get_model('home', 'ArchivedResponse')
+    CorrectResponderBitmap = apps.get_model('home', 'CorrectResponderBitmap')
+
+    missing = Question.objects.filter(correct_bitmap__isnull=True).values_list('id', flat=True)
+    for question_id in missing.iterator():
+        user_ids = set()
+        for model in (UserResponse, ArchivedResponse):
+            user_ids.update(
+                model.objects.filter(question_id=question_id, is_correct=True).values_list('user_id', flat=True)
+            )
+        data = bytearray((max(user_ids) // 8 + 1) if user_ids else 0)
+        for user_id in user_ids:
+            data[user_id // 8] |= 1 << user_id % 8
+        CorrectResponderBitmap.objects.create(
+            question_id=question_id, bitmap=zlib.compress(bytes(data)), cardinality=len(user_ids)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0014_ticket_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_bitmaps, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,32 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from django.utils.timezone import now, timedelta
 import random
 
 
+def schedule_active_question_invalidation(question_id=None):
+    # import داخلی برای جلوگیری از import چرخشی با question_cache
+    from .question_cache import schedule_invalidation
+    schedule_invalidation(question_id)
+
+
+def schedule_rotation_rearm():
+    # زمان‌بندی دوباره چرخش سوال‌ها پس از commit شدن تغییرات
+    from .leader import request_rotation_rearm
+    transaction.on_commit(request_rotation_rearm)
+
+
 class CustomUserManager(BaseUserManager):
-    def create_user(self, phone_number, password=None, **extra_fields):
+    def create_user(self, phone_number, password=None, password_hash=None, **extra_fields):
         if not phone_number:
             raise ValueError('شماره موبایل الزامی است')
         user = self.model(phone_number=phone_number, **extra_fields)
-        user.set_password(password)
+        if password_hash is not None:
+            # رمز عبور از قبل هش شده است (home.hashing)
+            user.password = password_hash
+        else:
+            user.set_password(password)
         user.save(using=self._db)
         return user
 
@@ -32,6 +48,34 @@ class PhoneOTP(models.Model):
         self.save()
 
 
+class OutboundSMS(models.Model):
+    """صف پیامک‌های خروجی؛ توسط دستور run_sms_worker به صورت دسته‌ای ارسال می‌شوند"""
+    STATUS_CHOICES = [
+        ('pending', 'در صف ارسال'),
+        ('sent', 'ارسال شده'),
+        ('failed', 'ناموفق'),
+    ]
+
+    phone_number = models.CharField(max_length=15, db_index=True, verbose_name='شماره موبایل')
+    body = models.TextField(verbose_name='متن پیام')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='وضعیت')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='تعداد تلاش')
+    next_attempt_at = models.DateTimeField(default=now, verbose_name='زمان تلاش بعدی')
+    last_error = models.TextField(blank=True, verbose_name='آخرین خطا')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='تاریخ ارسال')
+
+    class Meta:
+        verbose_name = 'پیامک خروجی'
+        verbose_name_plural = 'پیامک‌های خروجی'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='sms_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.phone_number} - {self.get_status_display()}"
+
+
 class User(AbstractUser):
     username = None
     email = None
@@ -55,6 +99,38 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.phone_number}"
 
+    def save(self, *args, **kwargs):
+        # توکن امضاشده بدون دیتابیس بررسی می‌شود؛ غیرفعال کردن کاربر باید توکن‌هایش را باطل کند.
+        # queryset.update(is_active=False) از این مسیر عبور نمی‌کند و باید revoke_tokens جداگانه صدا زده شود.
+        deactivated = (
+            self.pk is not None and not self.is_active
+            and User.objects.filter(pk=self.pk, is_active=True).exists()
+        )
+        super().save(*args, **kwargs)
+        if deactivated:
+            from .authentication import revoke_tokens
+            revoke_tokens(self)
+
+
+class TokenRevocation(models.Model):
+    """توکن‌های امضاشده کاربر که قبل از revoked_at صادر شده‌اند نامعتبرند"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='+',
+                                verbose_name='کاربر')
+    revoked_at = models.DateTimeField(verbose_name='تاریخ ابطال')
+
+    class Meta:
+        verbose_name = 'ابطال توکن'
+        verbose_name_plural = 'ابطال توکن‌ها'
+
+    def __str__(self):
+        return f"{self.user_id} - {self.revoked_at}"
+
+
+class QuestionQuerySet(models.QuerySet):
+    def active(self):
+        # از ایندکس یکتای جزئی روی is_active=True استفاده می‌کند
+        return self.filter(is_active=True)
+
 
 class Question(models.Model):
     text = models.TextField(verbose_name='متن سوال')
@@ -63,15 +139,39 @@ class Question(models.Model):
     correct_responders = models.ManyToManyField(User, blank=True, related_name='correct_questions',
                                                 verbose_name='کاربران با پاسخ درست')
     next_question = models.DateTimeField(verbose_name='تاریخ سوال بعدی')
+    is_archived = models.BooleanField(default=False, db_index=True, verbose_name='بایگانی شده')
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # در هر لحظه حداکثر یک سوال فعال وجود دارد
+            models.UniqueConstraint(fields=['is_active'], condition=models.Q(is_active=True),
+                                    name='single_active_question'),
+        ]
 
     def __str__(self):
         return self.text[:50]
 
+    def validate_constraints(self, exclude=None):
+        # سوال فعال قبلی در save غیرفعال می‌شود، پس فرم‌ها نباید فعال‌سازی را رد کنند
+        exclude = set(exclude or ()) | {'is_active'}
+        super().validate_constraints(exclude=exclude)
+
     def save(self, *args, **kwargs):
-        # غیرفعال کردن سوالات دیگر هنگام فعال‌سازی این سوال
+        # غیرفعال کردن سوال فعال قبلی هنگام فعال‌سازی این سوال (حداکثر یک ردیف از طریق ایندکس)
         if self.is_active:
-            Question.objects.exclude(pk=self.pk).update(is_active=False)
+            Question.objects.active().exclude(pk=self.pk).update(is_active=False)
         super().save(*args, **kwargs)
+        schedule_active_question_invalidation(self.pk)
+        schedule_rotation_rearm()
+
+    def delete(self, *args, **kwargs):
+        question_id = self.pk
+        result = super().delete(*args, **kwargs)
+        schedule_active_question_invalidation(question_id)
+        schedule_rotation_rearm()
+        return result
 
 
 class Choice(models.Model):
@@ -82,6 +182,15 @@ class Choice(models.Model):
     def __str__(self):
         return self.text
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        schedule_active_question_invalidation(self.question_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        schedule_active_question_invalidation(self.question_id)
+        return result
+
 
 class UserResponse(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='کاربر')
@@ -89,6 +198,11 @@ class UserResponse(models.Model):
     selected_choice = models.ForeignKey(Choice, on_delete=models.CASCADE, verbose_name='گزینه انتخاب شده')
     is_correct = models.BooleanField(default=False, verbose_name='آیا پاسخ درست است؟')
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'question'], name='unique_user_response_per_question'),
+        ]
+
     def save(self, *args, **kwargs):
         if self.selected_choice.is_correct:
             self.is_correct = True
@@ -99,6 +213,107 @@ class UserResponse(models.Model):
         return f"{self.user.phone_number} - {self.question.text[:50]}"
 
 
+class ArchivedResponse(models.Model):
+    """نسخه فشرده پاسخ‌های سوالات منقضی‌شده؛ بدون قید کلید خارجی و ایندکس‌های اضافه"""
+    question = models.ForeignKey(Question, on_delete=models.DO_NOTHING, db_constraint=False,
+                                 related_name='+', verbose_name='سوال')
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+                             related_name='+', verbose_name='کاربر')
+    selected_choice = models.ForeignKey(Choice, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+                                        related_name='+', verbose_name='گزینه انتخاب شده')
+    is_correct = models.BooleanField(default=False, verbose_name='آیا پاسخ درست است؟')
+
+    class Meta:
+        verbose_name = 'پاسخ بایگانی‌شده'
+        verbose_name_plural = 'پاسخ‌های بایگانی‌شده'
+
+
+class UserScore(models.Model):
+    """امتیاز تجمیعی هر کاربر برای جدول رتبه‌بندی؛ همزمان با ثبت پاسخ درست به‌روز می‌شود"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='score',
+                                verbose_name='کاربر')
+    correct_count = models.PositiveIntegerField(default=0, verbose_name='تعداد پاسخ درست')
+    # کپی استان و جنسیت کاربر برای رتبه‌بندی بدون join
+    province = models.CharField(max_length=50, verbose_name='استان')
+    gender = models.CharField(max_length=1, choices=User.GENDER_CHOICES, verbose_name='جنسیت')
+
+    class Meta:
+        verbose_name = 'امتیاز کاربر'
+        verbose_name_plural = 'امتیاز کاربران'
+        indexes = [
+            models.Index(fields=['-correct_count', 'user'], name='score_rank_idx'),
+            models.Index(fields=['province', '-correct_count', 'user'], name='score_province_rank_idx'),
+            models.Index(fields=['gender', '-correct_count', 'user'], name='score_gender_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.correct_count}"
+
+
+class AnswerStat(models.Model):
+    """شمارنده‌های پاسخ هر سوال به تفکیک گزینه، استان و جنسیت"""
+    DIMENSION_CHOICES = [
+        ('choice', 'گزینه'),
+        ('province', 'استان'),
+        ('gender', 'جنسیت'),
+    ]
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='answer_stats', verbose_name='سوال')
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES, verbose_name='بُعد')
+    key = models.CharField(max_length=50, verbose_name='مقدار')
+    # تقسیم هر شمارنده به چند ردیف برای کاهش رقابت روی یک ردیف پرتکرار
+    shard = models.PositiveSmallIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0, verbose_name='تعداد پاسخ')
+    correct = models.PositiveIntegerField(default=0, verbose_name='تعداد پاسخ درست')
+
+    class Meta:
+        verbose_name = 'آمار پاسخ'
+        verbose_name_plural = 'آمار پاسخ‌ها'
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'dimension', 'key', 'shard'], name='unique_answer_stat'),
+        ]
+
+    def __str__(self):
+        return f"{self.question_id} - {self.dimension}={self.key}"
+
+
+class CorrectResponderBitmap(models.Model):
+    """مجموعه فشرده آیدی کاربران با پاسخ درست به هر سوال (bitmap فشرده‌شده با zlib)"""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True,
+                                    related_name='correct_bitmap', verbose_name='سوال')
+    bitmap = models.BinaryField(default=b'')
+    cardinality = models.PositiveIntegerField(default=0, verbose_name='تعداد کاربران')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'بیت‌مپ پاسخ‌دهندگان درست'
+        verbose_name_plural = 'بیت‌مپ‌های پاسخ‌دهندگان درست'
+
+    def __str__(self):
+        return f"{self.question_id} - {self.cardinality}"
+
+
+class PrizeDraw(models.Model):
+    """نتیجه قرعه‌کشی بین پاسخ‌دهندگان درست؛ با seed ثبت‌شده قابل تکرار است"""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='prize_draws', verbose_name='سوال')
+    seed = models.CharField(max_length=64, verbose_name='seed')
+    candidates_count = models.PositiveIntegerField(verbose_name='تعداد شرکت‌کنندگان')
+    winners = models.JSONField(default=list, verbose_name='آیدی برندگان')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+                                   verbose_name='انجام‌دهنده')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ قرعه‌کشی')
+
+    class Meta:
+        verbose_name = 'قرعه‌کشی'
+        verbose_name_plural = 'قرعه‌کشی‌ها'
+
+    def __str__(self):
+        return f"{self.question} - {self.created_at}"
+
+
+# ایندکس جستجوی تیکت‌ها (مایگریشن 0014) با trigger روی جدول‌های Ticket و TicketReply به‌روز می‌شود.
+# در SQLite هر AlterField روی این دو مدل جدول را بازسازی و triggerها را بی‌صدا حذف می‌کند؛ چنین مایگریشنی
+# باید triggerها را دوباره بسازد (check_search_triggers در ticket_search نبود آن‌ها را گزارش می‌دهد).
 class Ticket(models.Model):
     STATUS_CHOICES = [
         ('pending', 'در حال بررسی'),
@@ -115,12 +330,17 @@ class Ticket(models.Model):
     class Meta:
         verbose_name = 'تیکت'
         verbose_name_plural = 'تیکت‌ها'
+        indexes = [
+            # لیست تیکت‌های هر کاربر با صفحه‌بندی cursor روی created_at
+            models.Index(fields=['user', '-created_at'], name='ticket_user_created_idx'),
+        ]
 
     def __str__(self):
         return self.subject
 
 
 class TicketReply(models.Model):
+    # triggerهای ایندکس جستجو روی این جدول هم هستند؛ توضیح بالای Ticket
     ticket = models.ForeignKey(Ticket, related_name='replies', on_delete=models.CASCADE, verbose_name='تیکت')
     reply_body = models.TextField(verbose_name='متن پاسخ')
     admin = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='مدیر')
@@ -135,6 +355,9 @@ class TicketReply(models.Model):
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
+        # بیدار کردن کلاینت‌هایی که منتظر پاسخ این تیکت هستند
+        from .ticket_events import schedule_notify_reply
+        schedule_notify_reply(self.ticket_id, self.ticket.user_id, self.pk)
         if self.ticket.status != 'replied':
             self.ticket.status = 'replied'
             self.ticket.save(update_fields=['status'])
@@ -162,6 +385,17 @@ class ContactInfo(models.Model):
         super().save(*args, **kwargs)
 
 
+class SchedulerLock(models.Model):
+    """قفل رهبری شِدولر؛ فقط پروسه‌ای که heartbeat آن تازه است jobها را اجرا می‌کند"""
+    name = models.CharField(max_length=50, primary_key=True)
+    owner = models.CharField(max_length=255)
+    heartbeat_at = models.DateTimeField()
+    rearm_requested_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} - {self.owner}"
+
+
 class AboutUs(models.Model):
     content = models.TextField(verbose_name='متن درباره ما')
 
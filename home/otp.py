@@ -0,0 +1,123 @@
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
+
+from .models import PhoneOTP
+
+# مدت اعتبار کد تأیید
+OTP_TTL = timedelta(minutes=5)
+
+VALID = 'valid'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+
+
+def generate_code():
+    return f"{random.randint(100000, 999999)}"
+
+
+def verified_ttl():
+    # مدت زمانی که پس از تأیید شماره برای ثبت‌نام فرصت هست
+    return timedelta(seconds=getattr(settings, 'OTP_VERIFIED_TTL', 30 * 60))
+
+
+class BaseOTPStore:
+    """رابط نگهداری کدهای تأیید شماره موبایل"""
+
+    def issue(self, phone_number):
+        """ساخت و ذخیره کد جدید؛ خروجی کد"""
+        raise NotImplementedError
+
+    def check(self, phone_number, otp):
+        """بررسی کد؛ خروجی یکی از VALID، INVALID یا EXPIRED"""
+        raise NotImplementedError
+
+    def mark_verified(self, phone_number):
+        raise NotImplementedError
+
+    def is_verified(self, phone_number):
+        raise NotImplementedError
+
+    def discard(self, phone_number):
+        raise NotImplementedError
+
+
+class ModelOTPStore(BaseOTPStore):
+    """نگهداری کدها در جدول PhoneOTP"""
+
+    def issue(self, phone_number):
+        otp_entry, created = PhoneOTP.objects.get_or_create(phone_number=phone_number)
+        otp_entry.generate_otp()
+        return otp_entry.otp
+
+    def check(self, phone_number, otp):
+        otp_entry = PhoneOTP.objects.filter(phone_number=phone_number).first()
+        if not otp_entry or otp_entry.otp != otp:
+            return INVALID
+        if now() > otp_entry.created_at + OTP_TTL:
+            return EXPIRED
+        return VALID
+
+    def mark_verified(self, phone_number):
+        PhoneOTP.objects.filter(phone_number=phone_number).update(is_verified=True)
+
+    def is_verified(self, phone_number):
+        return PhoneOTP.objects.filter(phone_number=phone_number, is_verified=True).exists()
+
+    def discard(self, phone_number):
+        PhoneOTP.objects.filter(phone_number=phone_number).delete()
+
+    def purge_expired(self):
+        """حذف کدهای منقضی‌شده تأییدنشده و کدهای تأییدشده‌ای که به ثبت‌نام نرسیده‌اند"""
+        current = now()
+        unverified = PhoneOTP.objects.filter(is_verified=False, created_at__lt=current - OTP_TTL).delete()[0]
+        verified = PhoneOTP.objects.filter(is_verified=True, created_at__lt=current - verified_ttl()).delete()[0]
+        return unverified + verified
+
+
+class CacheOTPStore(BaseOTPStore):
+    """نگهداری کدها در کش با انقضای خودکار؛ بدون نوشتن در دیتابیس"""
+    key_prefix = 'home:otp:'
+
+    def _key(self, phone_number):
+        return f"{self.key_prefix}{phone_number}"
+
+    def issue(self, phone_number):
+        code = generate_code()
+        cache.set(self._key(phone_number), {'otp': code, 'verified': False}, OTP_TTL.total_seconds())
+        return code
+
+    def check(self, phone_number, otp):
+        # کد منقضی‌شده از کش حذف شده و مثل کد نادرست رفتار می‌کند
+        entry = cache.get(self._key(phone_number))
+        if not entry or entry['otp'] != otp:
+            return INVALID
+        return VALID
+
+    def mark_verified(self, phone_number):
+        key = self._key(phone_number)
+        entry = cache.get(key)
+        if entry:
+            entry['verified'] = True
+            cache.set(key, entry, verified_ttl().total_seconds())
+
+    def is_verified(self, phone_number):
+        entry = cache.get(self._key(phone_number))
+        return bool(entry and entry['verified'])
+
+    def discard(self, phone_number):
+        cache.delete(self._key(phone_number))
+
+
+_store = None
+
+
+def get_otp_store():
+    global _store
+    if _store is None:
+        _store = import_string(getattr(settings, 'OTP_STORE', 'home.otp.ModelOTPStore'))()
+    return _store
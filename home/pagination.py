@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+
+
+class TicketCursorPagination(CursorPagination):
+    """صفحه‌بندی تیکت‌ها بر اساس تاریخ ایجاد (جدیدترین اول) با ایندکس (user, created_at)"""
+    ordering = '-created_at'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+def estimated_row_count(model, using='default'):
+    """تعداد تقریبی ردیف‌های جدول از آمار دیتابیس (بدون COUNT)؛ در صورت نبودن آمار None"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)', [table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            # آمار sqlite_stat1 با دستور ANALYZE ساخته می‌شود
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    صفحه‌بندی پنل ادمین برای جدول‌های بزرگ بدون COUNT(*) روی کل جدول.
+    لیست بدون فیلتر: تعداد تقریبی از آمار دیتابیس؛ لیست فیلترشده یا جدول کوچک:
+    شمارش تا سقف ADMIN_EXACT_COUNT_LIMIT (صفحه‌های بعد از سقف نمایش داده نمی‌شوند).
+    """
+
+    @cached_property
+    def count(self):
+        limit = getattr(settings, 'ADMIN_EXACT_COUNT_LIMIT', 10000)
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > limit:
+                return estimate
+        return queryset.order_by()[:limit].count()
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+
+class Subscription:
+    """صف پیام‌های یک مشترک async؛ مشترک کند فقط آخرین پیام‌ها را دریافت می‌کند"""
+
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def deliver(self, message):
+        # همیشه داخل event loop مشترک اجرا می‌شود
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """پیام بعدی؛ در صورت تمام شدن timeout مقدار None"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalPubSub:
+    """
+    pub/sub داخل پروسه: انتشار از هر thread (مثلاً job شِدولر) و دریافت در event loop.
+    برای پروسه‌های دیگر باید از طریق کش یا دیتابیس اطلاع‌رسانی شود.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, channel, maxsize=16):
+        subscription = Subscription(self, channel, maxsize)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def channels(self, prefix=''):
+        """کانال‌هایی که در این پروسه مشترک دارند"""
+        with self._lock:
+            return [name for name in self._subscribers if name.startswith(prefix)]
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # event loop مشترک بسته شده است
+                self.unsubscribe(subscription)
+        return len(subscribers)
+
+
+broker = LocalPubSub()
@@ -0,0 +1,191 @@
+import asyncio
+import threading
+import time
+import weakref
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache, caches
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+from django.db import transaction
+
+from .models import Question
+from .serializers import QuestionSerializer
+
+# اشاره‌گر سوال فعال در کش مشترک: (نسخه، آیدی سوال فعال)
+# فعال‌سازی سوال فقط با یک set روی این کلید انجام می‌شود و همه پروسه‌ها همزمان آن را می‌بینند
+POINTER_KEY = 'home:active-question:pointer'
+# داده سریال‌شده هر سوال؛ پیش از فعال شدن سوال آماده می‌شود (prewarm)
+PAYLOAD_KEY = 'home:active-question:payload:{}'
+
+# کش‌هایی که واقعاً بین پروسه‌ها مشترک‌اند؛ DatabaseCache هر خواندن را به کوئری تبدیل می‌کند
+# و با MAX_ENTRIES کلیدها را بدون توجه به اهمیتشان حذف می‌کند
+SHARED_CACHE_BACKENDS = (RedisCache, BaseMemcachedCache)
+
+_snapshot = None
+# فقط یک thread در هر پروسه هنگام تغییر نسخه داده را بارگذاری می‌کند
+_load_lock = threading.Lock()
+# بارگذاری در حال انجام برای هر event loop: (نسخه، task)
+_async_loads = weakref.WeakKeyDictionary()
+
+
+class ActiveQuestionSnapshot:
+    """نسخه‌ی سریال‌شده‌ی سوال فعال در حافظه"""
+    __slots__ = ('version', 'question_id', 'data', 'choices')
+
+    def __init__(self, version, question_id, data, choices=None):
+        self.version = version
+        self.question_id = question_id
+        self.data = data
+        # آیدی گزینه -> درست بودن؛ برای اعتبارسنجی پاسخ بدون کوئری
+        self.choices = choices or {}
+
+
+def is_shared_cache(alias='default'):
+    return isinstance(caches[alias], SHARED_CACHE_BACKENDS)
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs=None, **kwargs):
+    """check --deploy: چرخش سوال بدون کش مشترک به پروسه‌های وب نمی‌رسد"""
+    if is_shared_cache():
+        return []
+    return [checks.Warning(
+        'کش پیش‌فرض بین پروسه‌ها مشترک نیست؛ سوال فعال و وضعیت تیکت‌ها در هر پروسه جدا نگه داشته می‌شوند',
+        hint='REDIS_URL را تنظیم کنید یا CACHES را به Redis یا Memcached تغییر دهید',
+        id='home.W002',
+    )]
+
+
+def payload_key(question_id):
+    return PAYLOAD_KEY.format(question_id)
+
+
+def payload_ttl():
+    return getattr(settings, 'QUESTION_PAYLOAD_TTL', 24 * 3600)
+
+
+def _serialize(question):
+    choices = {choice.pk: choice.is_correct for choice in question.choices.all()}
+    return QuestionSerializer(question).data, choices
+
+
+def _question_queryset(question_id):
+    return Question.objects.filter(pk=question_id).prefetch_related('choices')
+
+
+def prewarm(question_id):
+    """سریال کردن سوال و نگه‌داشتن آن در کش مشترک؛ خروجی (data, choices) یا None"""
+    question = _question_queryset(question_id).first()
+    if question is None:
+        return None
+    payload = _serialize(question)
+    cache.set(payload_key(question_id), payload, payload_ttl())
+    return payload
+
+
+def swap(question_id):
+    """فعال‌سازی اتمیک: اول داده سوال در کش آماده می‌شود و بعد اشاره‌گر عوض می‌شود"""
+    if question_id is not None and cache.get(payload_key(question_id)) is None:
+        prewarm(question_id)
+    cache.set(POINTER_KEY, (time.time_ns(), question_id), None)
+
+
+def invalidate_active_question(question_id=None):
+    """
+    باطل کردن snapshot سوال فعال در همه پروسه‌ها.
+    question_id سوالی است که محتوای آن تغییر کرده و داده آماده‌اش باید دوباره ساخته شود.
+    """
+    if question_id is not None:
+        cache.delete(payload_key(question_id))
+    swap(Question.objects.active().values_list('id', flat=True).first())
+
+
+def schedule_invalidation(question_id=None):
+    """باطل کردن snapshot پس از commit شدن تراکنش جاری"""
+    transaction.on_commit(lambda: invalidate_active_question(question_id))
+
+
+def _init_pointer(active_id):
+    # کش خالی شده است؛ اولین پروسه اشاره‌گر را از روی دیتابیس می‌سازد
+    cache.add(POINTER_KEY, (time.time_ns(), active_id), None)
+    return cache.get(POINTER_KEY)
+
+
+def current_pointer():
+    return cache.get(POINTER_KEY) or _init_pointer(Question.objects.active().values_list('id', flat=True).first())
+
+
+async def acurrent_pointer():
+    # در مسیرهای async از API async کش استفاده می‌شود
+    pointer = await cache.aget(POINTER_KEY)
+    if pointer is None:
+        active_id = await Question.objects.active().values_list('id', flat=True).afirst()
+        await cache.aadd(POINTER_KEY, (time.time_ns(), active_id), None)
+        pointer = await cache.aget(POINTER_KEY)
+    return pointer
+
+
+def _build(pointer, payload):
+    version, question_id = pointer
+    if question_id is None or payload is None:
+        return ActiveQuestionSnapshot(version, None, None)
+    data, choices = payload
+    return ActiveQuestionSnapshot(version, question_id, data, choices)
+
+
+def _load(pointer):
+    question_id = pointer[1]
+    payload = None
+    if question_id is not None:
+        payload = cache.get(payload_key(question_id)) or prewarm(question_id)
+    return _build(pointer, payload)
+
+
+async def _aload(pointer):
+    question_id = pointer[1]
+    payload = None
+    if question_id is not None:
+        payload = await cache.aget(payload_key(question_id))
+        if payload is None:
+            question = await _question_queryset(question_id).afirst()
+            if question is not None:
+                payload = _serialize(question)
+                await cache.aset(payload_key(question_id), payload, payload_ttl())
+    return _build(pointer, payload)
+
+
+def get_active_question():
+    """
+    snapshot سوال فعال؛ تا زمانی که اشاره‌گر تغییر نکند بدون کوئری دیتابیس برگردانده می‌شود.
+    اگر سوال فعالی وجود نداشته باشد data برابر None است.
+    """
+    global _snapshot
+    pointer = current_pointer()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == pointer[0]:
+        return snapshot
+
+    with _load_lock:
+        snapshot = _snapshot
+        if snapshot is None or snapshot.version != pointer[0]:
+            snapshot = _snapshot = _load(pointer)
+    return snapshot
+
+
+async def aget_active_question():
+    """نسخه async از get_active_question برای ویوهای ASGI"""
+    global _snapshot
+    pointer = await acurrent_pointer()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == pointer[0]:
+        return snapshot
+
+    loop = asyncio.get_running_loop()
+    inflight = _async_loads.get(loop)
+    if inflight is None or inflight[0] != pointer[0]:
+        inflight = _async_loads[loop] = (pointer[0], loop.create_task(_aload(pointer)))
+    # shield: قطع شدن یک درخواست نباید بارگذاری مشترک را لغو کند
+    snapshot = _snapshot = await asyncio.shield(inflight[1])
+    return snapshot
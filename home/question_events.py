@@ -0,0 +1,101 @@
+import asyncio
+import json
+import logging
+import weakref
+
+from django.conf import settings
+
+from .pubsub import broker
+from .question_cache import aget_active_question
+
+logger = logging.getLogger(__name__)
+
+# اعلان چرخش سوال از job شِدولر داخل همین پروسه
+ROTATION_CHANNEL = 'question:rotation'
+
+
+def publish_rotation():
+    broker.publish(ROTATION_CHANNEL, 'rotated')
+
+
+def format_event(event, data, event_id=None):
+    """یک رویداد SSE با داده JSON"""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data, ensure_ascii=False)}"]
+    return '\n'.join(lines) + '\n\n'
+
+
+class QuestionEventRelay:
+    """
+    یک relay برای هر event loop: تغییر نسخه snapshot را دنبال می‌کند و رویداد SSE را
+    یک بار می‌سازد و برای همه کلاینت‌های متصل منتشر می‌کند.
+    چرخش در همین پروسه فوراً و در پروسه‌های دیگر با بررسی نسخه در کش
+    (هر QUESTION_EVENTS_POLL_INTERVAL ثانیه) دیده می‌شود.
+    """
+
+    def __init__(self):
+        self.channel = f"question:events:{id(self)}"
+        self.version = None
+        self.question_id = None
+        self.frame = None
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def refresh(self):
+        snapshot = await aget_active_question()
+        if snapshot.version == self.version:
+            return
+        rotated = self.version is not None and snapshot.question_id != self.question_id
+        self.version = snapshot.version
+        self.question_id = snapshot.question_id
+        # کلاینت تازه‌وارد همیشه رویداد question با وضعیت فعلی را دریافت می‌کند
+        self.frame = format_event('question', snapshot.data, snapshot.version)
+        frame = format_event('rotation', snapshot.data, snapshot.version) if rotated else self.frame
+        broker.publish(self.channel, (self.version, frame))
+
+    async def run(self):
+        interval = getattr(settings, 'QUESTION_EVENTS_POLL_INTERVAL', 1.0)
+        rotations = broker.subscribe(ROTATION_CHANNEL)
+        try:
+            while True:
+                try:
+                    await self.refresh()
+                except Exception:
+                    logger.exception('question event relay refresh failed')
+                await rotations.get(timeout=interval)
+        finally:
+            rotations.close()
+
+    async def stream(self, last_event_id=None):
+        """رویدادهای SSE برای یک کلاینت؛ با پیام ping اتصال زنده نگه داشته می‌شود"""
+        heartbeat = getattr(settings, 'QUESTION_EVENTS_HEARTBEAT', 15)
+        subscription = broker.subscribe(self.channel)
+        try:
+            if self.frame is None:
+                await self.refresh()
+            # نسخه و frame بدون await بین آن‌ها خوانده می‌شوند؛ همان نسخه اگر از صف هم برسد دوباره ارسال نمی‌شود
+            sent_version, frame = self.version, self.frame
+            yield f"retry: {int(heartbeat * 1000)}\n\n"
+            if last_event_id != str(sent_version):
+                yield frame
+            while True:
+                message = await subscription.get(timeout=heartbeat)
+                if message is None:
+                    yield ': ping\n\n'
+                    continue
+                version, frame = message
+                if version != sent_version:
+                    sent_version = version
+                    yield frame
+        finally:
+            subscription.close()
+
+
+_relays = weakref.WeakKeyDictionary()
+
+
+def get_relay():
+    loop = asyncio.get_running_loop()
+    relay = _relays.get(loop)
+    if relay is None or relay.task.done():
+        relay = _relays[loop] = QuestionEventRelay()
+    return relay
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from .models import *
+from .hashing import hash_password
+from .otp import EXPIRED, INVALID, get_otp_store
 
 
 class OTPSerializer(serializers.Serializer):
@@ -20,12 +22,12 @@ class VerifyOTPSerializer(serializers.Serializer):
         phone_number = data.get("phone_number")
         otp = data.get("otp")
 
-        otp_entry = PhoneOTP.objects.filter(phone_number=phone_number).first()
-        if not otp_entry or otp_entry.otp != otp:
+        result = get_otp_store().check(phone_number, otp)
+        if result == INVALID:
             raise serializers.ValidationError("کد تأیید وارد شده صحیح نیست.")
 
-        # بررسی انقضای کد (مثلاً 5 دقیقه)
-        if now() > otp_entry.created_at + timedelta(minutes=5):
+        # بررسی انقضای کد (5 دقیقه، OTP_TTL)
+        if result == EXPIRED:
             raise serializers.ValidationError("کد تأیید منقضی شده است.")
 
         return data
@@ -65,9 +67,10 @@ class UserSerializer(serializers.ModelSerializer):
 
         phone_number = validated_data.pop('phone_number')
 
+        # هش رمز عبور در pool جداگانه انجام می‌شود تا thread درخواست درگیر محاسبه نشود
         user = User.objects.create_user(
             phone_number=phone_number,
-            password=password,
+            password_hash=hash_password(password),
             **validated_data
         )
         return user
@@ -109,6 +112,16 @@ class UserResponseSerializer(serializers.ModelSerializer):
         return data
 
 
+class UserScoreSerializer(serializers.ModelSerializer):
+    first_name = serializers.CharField(source='user.first_name', read_only=True)
+    last_name = serializers.CharField(source='user.last_name', read_only=True)
+    gender = serializers.CharField(source='get_gender_display', read_only=True)
+
+    class Meta:
+        model = UserScore
+        fields = ['user', 'first_name', 'last_name', 'province', 'gender', 'correct_count']
+
+
 class TicketReplySerializer(serializers.ModelSerializer):
     class Meta:
         model = TicketReply
@@ -116,6 +129,11 @@ class TicketReplySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'admin']
 
 
+class BulkTicketReplySerializer(serializers.Serializer):
+    ticket_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+    reply_body = serializers.CharField()
+
+
 class TicketSerializer(serializers.ModelSerializer):
     replies = TicketReplySerializer(many=True, read_only=True)
 
@@ -125,8 +143,27 @@ class TicketSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'status', 'created_at', 'updated_at', 'replies']
 
     def create(self, validated_data):
-        request = self.context['request']
-        return Ticket.objects.create(user=request.user, **validated_data)
+        # perform_create هم user را می‌فرستد؛ ارسال دوباره آن به create خطا می‌داد
+        validated_data['user'] = self.context['request'].user
+        return Ticket.objects.create(**validated_data)
+
+
+class TicketListSerializer(TicketSerializer):
+    # از annotate در TicketCreateView.get_queryset
+    reply_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TicketSerializer.Meta):
+        fields = TicketSerializer.Meta.fields + ['reply_count']
+
+
+class TicketSummarySerializer(serializers.ModelSerializer):
+    """لیست تیکت‌ها بدون پاسخ‌ها (?replies=0)؛ پاسخ‌ها با جزئیات تیکت (و ?since=) خوانده می‌شوند"""
+    reply_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Ticket
+        fields = ['id', 'subject', 'body', 'status', 'created_at', 'updated_at', 'reply_count']
+        read_only_fields = fields
 
 
 class ContactInfoSerializer(serializers.ModelSerializer):
@@ -0,0 +1,129 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboundSMS
+
+
+class BaseSMSGateway:
+    """رابط درگاه پیامک؛ درگاه واقعی باید send_batch را پیاده‌سازی کند"""
+
+    def send_batch(self, messages):
+        """
+        ارسال لیستی از OutboundSMS.
+        خروجی: دیکشنری آیدی پیام -> متن خطا (None یعنی ارسال موفق)
+        """
+        raise NotImplementedError
+
+
+class ConsoleGateway(BaseSMSGateway):
+    """چاپ پیام‌ها در ترمینال (به جای ارسال پیامک)"""
+
+    def send_batch(self, messages):
+        for message in messages:
+            print(f"پیامک به {message.phone_number}: {message.body}")
+        return {message.pk: None for message in messages}
+
+
+class FakeGateway(BaseSMSGateway):
+    """درگاه محلی برای تست؛ پیام‌ها در outbox نگه داشته می‌شوند"""
+
+    def __init__(self, failing_numbers=()):
+        self.outbox = []
+        self.failing_numbers = set(failing_numbers)
+
+    def send_batch(self, messages):
+        results = {}
+        for message in messages:
+            if message.phone_number in self.failing_numbers:
+                results[message.pk] = 'fake gateway failure'
+            else:
+                self.outbox.append((message.phone_number, message.body))
+                results[message.pk] = None
+        return results
+
+
+def get_gateway():
+    return import_string(getattr(settings, 'SMS_GATEWAY', 'home.sms.ConsoleGateway'))()
+
+
+def recently_queued(phone_number):
+    """آیا در بازه SMS_DEDUP_WINDOW ثانیه اخیر پیامی برای این شماره در صف یا ارسال شده است؟"""
+    since = timezone.now() - timedelta(seconds=getattr(settings, 'SMS_DEDUP_WINDOW', 60))
+    return OutboundSMS.objects.filter(
+        phone_number=phone_number, created_at__gte=since, status__in=['pending', 'sent']
+    ).exists()
+
+
+def enqueue(phone_number, body):
+    return OutboundSMS.objects.create(phone_number=phone_number, body=body)
+
+
+def purge_finished():
+    """حذف پیام‌های ارسال‌شده یا ناموفق قدیمی‌تر از SMS_RETENTION ثانیه؛ خروجی تعداد ردیف‌های حذف‌شده"""
+    before = timezone.now() - timedelta(seconds=getattr(settings, 'SMS_RETENTION', 7 * 24 * 3600))
+    return OutboundSMS.objects.filter(status__in=['sent', 'failed'], created_at__lt=before).delete()[0]
+
+
+def retry_delay(attempts):
+    """فاصله تلاش دوباره به صورت نمایی: base * 2^(attempts-1)"""
+    return timedelta(seconds=getattr(settings, 'SMS_RETRY_BACKOFF', 5) * 2 ** (attempts - 1))
+
+
+def claim_batch(size):
+    """
+    رزرو دسته‌ای از پیام‌های آماده ارسال.
+    زمان تلاش بعدی جلو برده می‌شود تا workerهای دیگر همان پیام‌ها را برندارند.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboundSMS.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:size]
+        )
+        OutboundSMS.objects.filter(id__in=ids).update(
+            next_attempt_at=now + timedelta(seconds=getattr(settings, 'SMS_SEND_TIMEOUT', 60))
+        )
+    return list(OutboundSMS.objects.filter(id__in=ids))
+
+
+def process_batch(gateway=None, size=None):
+    """ارسال یک دسته پیام و ثبت نتیجه؛ خروجی تعداد پیام‌های پردازش‌شده"""
+    gateway = gateway or get_gateway()
+    messages = claim_batch(size or getattr(settings, 'SMS_BATCH_SIZE', 100))
+    if not messages:
+        return 0
+
+    try:
+        results = gateway.send_batch(messages)
+    except Exception as e:
+        results = {message.pk: str(e) or e.__class__.__name__ for message in messages}
+
+    now = timezone.now()
+    max_attempts = getattr(settings, 'SMS_MAX_ATTEMPTS', 5)
+    errors = {message.pk: results.get(message.pk, 'no result from gateway') for message in messages}
+    sent_ids = [pk for pk, error in errors.items() if error is None]
+    # متن پیام (کد تأیید) بعد از ارسال یا شکست نهایی نگه داشته نمی‌شود
+    OutboundSMS.objects.filter(id__in=sent_ids).update(
+        status='sent', sent_at=now, attempts=F('attempts') + 1, last_error='', body=''
+    )
+    for message in messages:
+        error = errors[message.pk]
+        if error is None:
+            continue
+        attempts = message.attempts + 1
+        failed = attempts >= max_attempts
+        OutboundSMS.objects.filter(pk=message.pk).update(
+            attempts=attempts,
+            last_error=error,
+            status='failed' if failed else 'pending',
+            next_attempt_at=now + retry_delay(attempts),
+            **({'body': ''} if failed else {}),
+        )
+    return len(messages)
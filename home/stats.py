@@ -0,0 +1,155 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import AnswerStat, ArchivedResponse, Choice, User, UserResponse
+from .transactions import retry_on_conflict, snapshot_atomic
+
+
+def shard_count():
+    return max(1, getattr(settings, 'ANSWER_STATS_SHARDS', 8))
+
+
+def record_answers(answers):
+    """
+    افزایش شمارنده‌ها برای پاسخ‌های ثبت‌شده؛ داخل تراکنش ثبت پاسخ صدا زده می‌شود.
+    هر آیتم: (question_id, choice_id, is_correct, user_id, province, gender)
+    """
+    shards = shard_count()
+    totals = Counter()
+    corrects = Counter()
+    for question_id, choice_id, is_correct, user_id, province, gender in answers:
+        shard = user_id % shards
+        for dimension, key in (('choice', choice_id), ('province', province), ('gender', gender)):
+            counter_key = (question_id, dimension, str(key), shard)
+            totals[counter_key] += 1
+            corrects[counter_key] += int(bool(is_correct))
+
+    for (question_id, dimension, key, shard), total in totals.items():
+        correct = corrects[(question_id, dimension, key, shard)]
+        counters = AnswerStat.objects.filter(question_id=question_id, dimension=dimension, key=key, shard=shard)
+        if counters.update(total=F('total') + total, correct=F('correct') + correct):
+            continue
+        try:
+            with transaction.atomic():
+                AnswerStat.objects.create(
+                    question_id=question_id, dimension=dimension, key=key, shard=shard,
+                    total=total, correct=correct,
+                )
+        except IntegrityError:
+            counters.update(total=F('total') + total, correct=F('correct') + correct)
+
+
+def record_user_answers(responses):
+    """ثبت آمار برای لیستی از UserResponse که فقط user_id آن‌ها مشخص است"""
+    users = User.objects.only('province', 'gender').in_bulk({r.user_id for r in responses})
+    record_answers(
+        (r.question_id, r.selected_choice_id, r.is_correct, r.user_id, users[r.user_id].province,
+         users[r.user_id].gender)
+        for r in responses
+        if r.user_id in users
+    )
+
+
+def question_stats(question_id):
+    """جمع شمارنده‌های همه shardها به تفکیک گزینه، استان و جنسیت"""
+    rows = AnswerStat.objects.filter(question_id=question_id).values('dimension', 'key').annotate(
+        total_sum=Sum('total'), correct_sum=Sum('correct')
+    ).order_by('dimension', 'key')
+
+    choice_texts = dict(Choice.objects.filter(question_id=question_id).values_list('id', 'text'))
+    gender_display = dict(User.GENDER_CHOICES)
+    stats = {'choices': [], 'provinces': [], 'genders': []}
+    for row in rows:
+        total, correct = row['total_sum'], row['correct_sum']
+        if row['dimension'] == 'choice':
+            choice_id = int(row['key'])
+            stats['choices'].append({'choice': choice_id, 'text': choice_texts.get(choice_id, ''), 'total': total})
+            continue
+
+        entry = {'total': total, 'correct': correct, 'correct_rate': round(correct / total, 4) if total else 0}
+        if row['dimension'] == 'province':
+            entry['province'] = row['key']
+            stats['provinces'].append(entry)
+        else:
+            entry['gender'] = gender_display.get(row['key'], row['key'])
+            stats['genders'].append(entry)
+    return stats
+
+
+def _expected_counts(question_id):
+    fields = {'choice': 'selected_choice_id', 'province': 'user__province', 'gender': 'user__gender'}
+    counts = defaultdict(lambda: [0, 0])
+    for model in (UserResponse, ArchivedResponse):
+        for dimension, field in fields.items():
+            rows = model.objects.filter(question_id=question_id).values(field).annotate(
+                total=Count('id'), correct=Count('id', filter=Q(is_correct=True))
+            ).values_list(field, 'total', 'correct').order_by()
+            for key, total, correct in rows:
+                counts[(dimension, str(key))][0] += total
+                counts[(dimension, str(key))][1] += correct
+    return counts
+
+
+def _apply_delta(values, index, delta):
+    """افزودن اختلاف به shard صفر؛ اختلاف منفی از shardهای بزرگ‌تر کم می‌شود تا شمارنده‌ای منفی نشود"""
+    values[0][index] += delta
+    for shard in sorted(values, key=lambda s: -values[s][index]):
+        if values[0][index] >= 0:
+            break
+        if shard == 0:
+            continue
+        moved = min(values[shard][index], -values[0][index])
+        values[shard][index] -= moved
+        values[0][index] += moved
+
+
+def _reconcile_once(question_id):
+    # شمارش پاسخ‌ها و خواندن شمارنده‌ها باید از یک snapshot باشند
+    with snapshot_atomic():
+        expected = _expected_counts(question_id)
+        current = defaultdict(dict)
+        rows = AnswerStat.objects.filter(question_id=question_id).values_list(
+            'pk', 'dimension', 'key', 'shard', 'total', 'correct'
+        )
+        for pk, dimension, key, shard, total, correct in rows:
+            current[(dimension, key)][shard] = [total, correct, pk]
+
+        changed = 0
+        for dimension, key in set(expected) | set(current):
+            shards = current[(dimension, key)]
+            total, correct = expected.get((dimension, key), (0, 0))
+            delta_total = total - sum(values[0] for values in shards.values())
+            delta_correct = correct - sum(values[1] for values in shards.values())
+            if not delta_total and not delta_correct:
+                continue
+            changed += 1
+            if (dimension, key) not in expected:
+                # مقداری که هیچ پاسخی ندارد (مثلاً استان اشتباه) کلاً حذف می‌شود
+                AnswerStat.objects.filter(pk__in=[values[2] for values in shards.values()]).delete()
+                continue
+            before = {shard: list(values) for shard, values in shards.items()}
+            shards.setdefault(0, [0, 0, None])
+            _apply_delta(shards, 0, delta_total)
+            _apply_delta(shards, 1, delta_correct)
+            for shard, (new_total, new_correct, pk) in shards.items():
+                if pk is None:
+                    AnswerStat.objects.create(
+                        question_id=question_id, dimension=dimension, key=key, shard=shard,
+                        total=new_total, correct=new_correct,
+                    )
+                elif before[shard][:2] != [new_total, new_correct]:
+                    AnswerStat.objects.filter(pk=pk).update(total=new_total, correct=new_correct)
+    return changed
+
+
+def reconcile_question(question_id):
+    """
+    اصلاح شمارنده‌های یک سوال از روی پاسخ‌های زنده و بایگانی‌شده برای رفع انحراف.
+    شمارش پاسخ‌ها و خواندن شمارنده‌ها در یک snapshot انجام می‌شود و فقط اختلاف آن‌ها نوشته می‌شود؛
+    اگر ثبت پاسخی همزمان همان ردیف‌ها را تغییر دهد تراکنش با خطای serialization رد و دوباره اجرا می‌شود،
+    پس افزایش‌های همزمان گم نمی‌شوند. خروجی تعداد شمارنده‌های اصلاح‌شده.
+    """
+    return retry_on_conflict(_reconcile_once, question_id)
@@ -0,0 +1,93 @@
+from django.db import IntegrityError, transaction
+
+from . import bitmap
+from .leaderboard import add_correct_answers
+from .models import Question, UserResponse
+from .question_cache import get_active_question
+from .stats import record_answers
+
+CorrectResponder = Question.correct_responders.through
+
+NO_ACTIVE_QUESTION = 'هیچ سوال فعالی وجود ندارد.'
+INVALID_CHOICE = 'گزینه انتخاب شده معتبر نیست.'
+ALREADY_ANSWERED = 'شما قبلاً به این سوال پاسخ داده‌اید.'
+
+
+class SubmissionError(Exception):
+    """خطای ثبت پاسخ که پیام آن مستقیماً به کاربر برگردانده می‌شود"""
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def check_choice(snapshot, selected_choice_id):
+    """
+    اعتبارسنجی گزینه روی snapshot سوال فعال (بدون کوئری دیتابیس)
+    خروجی: (snapshot, آیدی گزینه, درست بودن گزینه)
+    """
+    if snapshot.question_id is None:
+        raise SubmissionError(NO_ACTIVE_QUESTION)
+
+    try:
+        choice_id = int(selected_choice_id)
+    except (TypeError, ValueError):
+        raise SubmissionError(INVALID_CHOICE)
+
+    if choice_id not in snapshot.choices:
+        raise SubmissionError(INVALID_CHOICE)
+    return snapshot, choice_id, snapshot.choices[choice_id]
+
+
+def resolve_choice(selected_choice_id):
+    return check_choice(get_active_question(), selected_choice_id)
+
+
+def submit_response(user, selected_choice_id):
+    """
+    ثبت پاسخ کاربر برای سوال فعال در یک تراکنش.
+    تکراری بودن پاسخ با قید یکتای (user, question) در دیتابیس تشخیص داده می‌شود.
+    """
+    snapshot, choice_id, is_correct = resolve_choice(selected_choice_id)
+
+    # کاربرِ توکن امضاشده فقط آیدی دارد؛ استان و جنسیت برای آمار با یک کوئری خوانده می‌شوند
+    if {'province', 'gender'} & user.get_deferred_fields():
+        user.refresh_from_db(fields=['province', 'gender'])
+
+    response = UserResponse(
+        user_id=user.pk,
+        question_id=snapshot.question_id,
+        selected_choice_id=choice_id,
+        is_correct=is_correct,
+    )
+    try:
+        with transaction.atomic():
+            insert_response(response)
+            record_answers([(snapshot.question_id, choice_id, is_correct, user.pk, user.province, user.gender)])
+            if is_correct:
+                CorrectResponder.objects.bulk_create(
+                    [CorrectResponder(question_id=snapshot.question_id, user_id=user.pk)],
+                    ignore_conflicts=True,
+                )
+                add_correct_answers([user.pk])
+                bitmap.mark_correct(snapshot.question_id, [user.pk])
+    except IntegrityError:
+        # کلیدهای خارجی در SQLite (و DEFERRABLE در PostgreSQL) هنگام commit بررسی می‌شوند:
+        # سوال بین خواندن snapshot و ثبت پاسخ حذف شده است
+        if not Question.objects.filter(pk=snapshot.question_id).exists():
+            raise SubmissionError(NO_ACTIVE_QUESTION)
+        raise
+
+    return is_correct
+
+
+def insert_response(response):
+    """درج پاسخ در savepoint جداگانه؛ فقط تکراری بودن (user, question) به ALREADY_ANSWERED تبدیل می‌شود"""
+    try:
+        with transaction.atomic():
+            # bulk_create از UserResponse.save عبور نمی‌کند و correct_responders دوباره اضافه نمی‌شود
+            UserResponse.objects.bulk_create([response])
+    except IntegrityError:
+        if UserResponse.objects.filter(user_id=response.user_id, question_id=response.question_id).exists():
+            raise SubmissionError(ALREADY_ANSWERED)
+        raise
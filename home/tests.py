@@ -1,3 +1,546 @@
-from django.test import TestCase
+import asyncio
+import random
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache, caches
+from django.db import IntegrityError, OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import (
+    apscheduler, authentication, bitmap, buffers, draw, hashing, ingestion, question_cache, sms, stats, submission,
+    ticket_events, ticket_search, throttling,
+)
+from .authentication import issue_token, revocations, revoke_tokens, verify_token
+from .buffers import WriteBehindBuffer
+from .models import (
+    ArchivedResponse, Choice, OutboundSMS, Question, Ticket, TicketReply, TokenRevocation, User, UserResponse,
+    UserScore,
+)
+from .otp import get_otp_store
+from .submission import ALREADY_ANSWERED, NO_ACTIVE_QUESTION, SubmissionError
+
+
+def make_user(phone_number='09120000000', **extra_fields):
+    return User.objects.create_user(
+        phone_number=phone_number, password='secret', first_name='نام', last_name='خانوادگی',
+        province='تهران', gender='M', **extra_fields
+    )
+
+
+class SignedTokenTests(TestCase):
+    def setUp(self):
+        revocations.reset()
+        self.user = make_user()
+
+    def test_issued_token_is_valid(self):
+        self.assertEqual(verify_token(issue_token(self.user)), self.user.pk)
+
+    def test_tampered_token_is_rejected(self):
+        payload, signature = issue_token(self.user).rsplit('.', 1)
+        other = make_user('09120000001')
+        forged = payload.replace(f".{self.user.pk}.", f".{other.pk}.", 1)
+        self.assertIsNone(verify_token(f"{forged}.{signature}"))
+        self.assertIsNone(verify_token(f"{payload}.{'0' * len(signature)}"))
+        self.assertIsNone(verify_token('v1.1.2'))
+
+    def test_unknown_key_version_is_rejected(self):
+        token = issue_token(self.user)
+        with override_settings(AUTH_TOKEN_KEYS={'2': 'another-key'}, AUTH_TOKEN_KEY_VERSION='2'):
+            self.assertIsNone(verify_token(token))
+
+    def test_old_key_is_accepted_after_rotation(self):
+        with override_settings(AUTH_TOKEN_KEYS={'1': 'old-key'}, AUTH_TOKEN_KEY_VERSION='1'):
+            token = issue_token(self.user)
+        with override_settings(AUTH_TOKEN_KEYS={'1': 'old-key', '2': 'new-key'}, AUTH_TOKEN_KEY_VERSION='2'):
+            self.assertEqual(verify_token(token), self.user.pk)
+            self.assertIn('.2.', issue_token(self.user))
+
+    @override_settings(AUTH_TOKEN_TTL=60)
+    def test_expired_token_is_rejected(self):
+        token = issue_token(self.user)
+        issued_at = int(token.split('.')[2])
+        with mock.patch.object(authentication.time, 'time', return_value=issued_at + 59):
+            self.assertEqual(verify_token(token), self.user.pk)
+        with mock.patch.object(authentication.time, 'time', return_value=issued_at + 61):
+            self.assertIsNone(verify_token(token))
+
+    def test_revoked_token_is_rejected(self):
+        token = issue_token(self.user)
+        revoke_tokens(self.user)
+        self.assertIsNone(verify_token(token))
+        # توکنی که بعد از ابطال صادر شود معتبر است
+        issued_at = int(TokenRevocation.objects.get(user=self.user).revoked_at.timestamp()) + 1
+        with mock.patch.object(authentication.time, 'time', return_value=issued_at):
+            self.assertEqual(verify_token(issue_token(self.user)), self.user.pk)
+
+    def test_revocation_is_loaded_from_database(self):
+        # ابطال در پروسه دیگر: فقط ردیف دیتابیس وجود دارد و لیست داخل پروسه دوباره خوانده می‌شود
+        token = issue_token(self.user)
+        self.assertEqual(verify_token(token), self.user.pk)
+        TokenRevocation.objects.create(user=self.user, revoked_at=timezone.now())
+        revocations.reset()
+        self.assertIsNone(verify_token(token))
+
+    @override_settings(AUTH_TOKEN_TTL=60)
+    def test_expired_revocations_are_ignored_and_deleted(self):
+        other = make_user('09120000001')
+        TokenRevocation.objects.create(user=other, revoked_at=timezone.now() - timedelta(seconds=61))
+        revocations.reset()
+        self.assertEqual(revocations.revoked_before(other.pk), 0)
+        revoke_tokens(self.user)
+        self.assertEqual(list(TokenRevocation.objects.values_list('user_id', flat=True)), [self.user.pk])
+
+    def test_deactivating_user_revokes_tokens(self):
+        token = issue_token(self.user)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(verify_token(token))
+
+    def test_request_with_revoked_token_is_unauthorized(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {issue_token(self.user)}")
+        self.assertEqual(client.get('/api/tickets/').status_code, 200)
+        revoke_tokens(self.user)
+        self.assertEqual(client.get('/api/tickets/').status_code, 401)
+
+
+class AsyncAuthViewTests(TestCase):
+    def setUp(self):
+        revocations.reset()
+
+    async def test_login(self):
+        user = await sync_to_async(make_user)()
+        response = await self.async_client.post(
+            '/api/async/login/', {'phone_number': user.phone_number, 'password': 'secret'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(await sync_to_async(verify_token)(response.json()['token']), user.pk)
+
+        response = await self.async_client.post(
+            '/api/async/login/', {'phone_number': user.phone_number, 'password': 'wrong'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 401)
+
+    async def test_login_when_hashing_is_busy(self):
+        with mock.patch.object(hashing, 'averify_password', side_effect=hashing.HashingBusy):
+            await sync_to_async(make_user)()
+            response = await self.async_client.post(
+                '/api/async/login/', {'phone_number': '09120000000', 'password': 'secret'},
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+    async def test_signup_requires_verified_phone_number(self):
+        data = {
+            'phone_number': '09120000002', 'first_name': 'نام', 'last_name': 'خانوادگی', 'province': 'تهران',
+            'gender': 'M', 'password': 'secret', 'confirm_password': 'secret',
+        }
+        response = await self.async_client.post('/api/async/signup/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        otp_store = get_otp_store()
+        await sync_to_async(otp_store.issue)(data['phone_number'])
+        await sync_to_async(otp_store.mark_verified)(data['phone_number'])
+        response = await self.async_client.post('/api/async/signup/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        user = await User.objects.aget(phone_number=data['phone_number'])
+        self.assertTrue(user.check_password('secret'))
+        self.assertFalse(await sync_to_async(otp_store.is_verified)(data['phone_number']))
+
+
+def make_question(text='سوال'):
+    question = Question.objects.create(text=text, expiry_date=timezone.now(), next_question=timezone.now())
+    choice = Choice.objects.create(question=question, text='گزینه', is_correct=True)
+    return question, choice
+
+
+class BitmapTests(TestCase):
+    def test_set_bits_and_iterate(self):
+        data = bytearray()
+        self.assertEqual(bitmap.set_bits(data, [3, 17, 3, 8]), 3)
+        self.assertEqual(list(bitmap.iter_user_ids(bitmap.to_int(data))), [3, 8, 17])
+        self.assertEqual(bitmap.decode(bitmap.encode(data + bytes(10))), data)
+        self.assertEqual(bitmap.decode(b''), bytearray())
+
+    def test_add_users_counts_new_users_only(self):
+        question, choice = make_question()
+        self.assertEqual(bitmap.add_users(question.pk, [5, 9]), 2)
+        self.assertEqual(bitmap.add_users(question.pk, [9, 12]), 1)
+        self.assertEqual(bitmap.correct_count(question.pk), 3)
+        self.assertTrue(bitmap.is_correct_responder(question.pk, 12))
+        self.assertFalse(bitmap.is_correct_responder(question.pk, 6))
+
+    def test_rebuild_reads_live_and_archived_responses(self):
+        question, choice = make_question()
+        users = [make_user(f"0912000000{i}") for i in range(4)]
+        UserResponse.objects.bulk_create([
+            UserResponse(user=users[0], question=question, selected_choice=choice, is_correct=True),
+            UserResponse(user=users[1], question=question, selected_choice=choice, is_correct=False),
+        ])
+        ArchivedResponse.objects.create(user=users[2], question=question, selected_choice=choice, is_correct=True)
+        self.assertEqual(bitmap.rebuild(question.pk), 2)
+        self.assertEqual(
+            list(bitmap.iter_user_ids(bitmap.load(question.pk))), sorted([users[0].pk, users[2].pk])
+        )
+        self.assertFalse(bitmap.is_correct_responder(question.pk, users[3].pk))
+
+
+class DrawTests(TestCase):
+    def test_select_ranks_matches_bit_order(self):
+        data = bytearray()
+        user_ids = sorted(set(random.Random(1).sample(range(draw.BLOCK_SIZE * 8 * 3), 5000)))
+        bitmap.set_bits(data, user_ids)
+        ranks = [0, 1, 700, 2500, 2501, 4999]
+        self.assertEqual(list(draw.select_ranks(data, ranks)), [user_ids[rank] for rank in ranks])
+        self.assertEqual(list(draw.select_ranks(data, [])), [])
+        self.assertEqual(list(draw.select_ranks(bytearray(), [0])), [])
+
+    def test_same_seed_draws_same_winners(self):
+        question, choice = make_question()
+        Question.objects.filter(pk=question.pk).update(is_archived=True)
+        # جدول بایگانی قید کلید خارجی ندارد
+        ArchivedResponse.objects.bulk_create([
+            ArchivedResponse(user_id=user_id, question=question, selected_choice=choice, is_correct=True)
+            for user_id in range(1, 200, 3)
+        ])
+        bitmap.add_users(question.pk, range(1, 200, 3))
+        first = draw.draw_winners(question.pk, 5, seed='seed')
+        second = draw.draw_winners(question.pk, 5, seed='seed')
+        self.assertEqual(first.candidates_count, 67)
+        self.assertEqual(first.winners, second.winners)
+        self.assertEqual(len(set(first.winners)), 5)
+        self.assertTrue(all(winner % 3 == 1 for winner in first.winners))
+
+    def test_draw_rebuilds_missing_bitmap(self):
+        question, choice = make_question()
+        user = make_user()
+        UserResponse.objects.bulk_create([
+            UserResponse(user=user, question=question, selected_choice=choice, is_correct=True),
+        ])
+        prize_draw = draw.draw_winners(question.pk, 3)
+        self.assertEqual(prize_draw.candidates_count, 1)
+        self.assertEqual(prize_draw.winners, [user.pk])
+
+    def test_draw_rebuilds_stale_bitmap(self):
+        question, choice = make_question()
+        user = make_user()
+        UserResponse.objects.bulk_create([
+            UserResponse(user=user, question=question, selected_choice=choice, is_correct=True),
+        ])
+        # bitmap عقب‌مانده (مثلاً صف write-behind هنوز نوشته نشده یا آیتمی را از دست داده است)
+        bitmap.add_users(question.pk, [user.pk + 1000])
+        self.assertEqual(draw.draw_winners(question.pk, 3).winners, [user.pk])
+
+        Question.objects.filter(pk=question.pk).update(is_archived=True)
+        bitmap.add_users(question.pk, [user.pk + 1000])
+        self.assertEqual(draw.draw_winners(question.pk, 3).winners, [user.pk])
+
+
+class TicketSearchTriggerTests(TestCase):
+    databases = {'default'}
+
+    def test_missing_trigger_is_reported(self):
+        self.assertEqual(ticket_search.check_search_triggers(databases=['default']), [])
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER home_ticket_fts_au')
+        warnings = ticket_search.check_search_triggers(databases=['default'])
+        self.assertEqual([warning.id for warning in warnings], ['home.W001'])
+        self.assertIn('home_ticket_fts_au', warnings[0].msg)
+
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        caches['throttle'].clear()
+
+    @mock.patch.object(throttling.time, 'time', return_value=1_800_000_010.0)
+    def test_rejected_request_does_no_database_work(self, _time):
+        # زمان ثابت تا پنجره throttle وسط تست عوض نشود
+        client = APIClient()
+        data = {'phone_number': '09120000000', 'password': 'wrong'}
+        for _ in range(5):
+            self.assertEqual(client.post('/api/login/', data).status_code, 401)
+        with self.assertNumQueries(0):
+            response = client.post('/api/login/', data)
+        self.assertEqual(response.status_code, 429)
+
+
+class QuestionRotationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+
+    def make_question(self, expires_in, next_in, is_active=False):
+        return Question.objects.create(
+            text='سوال', expiry_date=self.now + timedelta(seconds=expires_in),
+            next_question=self.now + timedelta(seconds=next_in), is_active=is_active,
+        )
+
+    def test_past_next_question_without_queue_is_not_a_transition(self):
+        active = self.make_question(3600, -60, is_active=True)
+        self.assertEqual(apscheduler.next_transition_at(), active.expiry_date)
+        queued = self.make_question(7200, 0)
+        self.assertEqual(apscheduler.next_transition_at(), active.next_question)
+        queued.delete()
+        active.delete()
+        self.assertIsNone(apscheduler.next_transition_at())
+
+    def test_switch_without_changes_keeps_pointer(self):
+        self.make_question(3600, -60, is_active=True)
+        pointer = question_cache.current_pointer()
+        with mock.patch.object(apscheduler, 'publish_rotation') as publish:
+            self.assertEqual(apscheduler.switch_questions(), [])
+        self.assertEqual(question_cache.current_pointer(), pointer)
+        publish.assert_not_called()
+
+    def test_switch_activates_queued_question(self):
+        expired = self.make_question(-1, -60, is_active=True)
+        queued = self.make_question(3600, 7200)
+        pointer = question_cache.current_pointer()
+        with mock.patch.object(apscheduler, 'publish_rotation') as publish:
+            self.assertEqual(apscheduler.switch_questions(), [expired.pk])
+        self.assertEqual(question_cache.current_pointer()[1], queued.pk)
+        self.assertNotEqual(question_cache.current_pointer()[0], pointer[0])
+        publish.assert_called_once()
+        queued.refresh_from_db()
+        self.assertTrue(queued.is_active)
+
+    def test_rotation_is_rearmed_for_the_next_transition(self):
+        active = self.make_question(3600, -60, is_active=True)
+        scheduler = mock.Mock(running=True)
+        with mock.patch.object(apscheduler, 'scheduler', scheduler), \
+                mock.patch.object(apscheduler, 'archive_expired_questions'):
+            apscheduler.rotate_questions()
+        run_dates = {call.kwargs['id']: call.kwargs['run_date'] for call in scheduler.add_job.call_args_list}
+        self.assertEqual(run_dates[apscheduler.ROTATION_JOB_ID], active.expiry_date)
+
+
+class WriteBehindBufferTests(TestCase):
+    def test_failed_items_are_retried_then_spilled(self):
+        spilled = []
+        buffer = WriteBehindBuffer(mock.Mock(side_effect=OperationalError), max_attempts=2, spill=spilled.extend)
+        buffer._items = [('a', 0)]
+        with self.assertLogs(buffers.logger, 'ERROR'):
+            buffer.flush()
+            self.assertEqual((len(buffer), spilled, buffer.backoff()), (1, [], 2.0))
+            buffer.flush()
+        self.assertEqual((len(buffer), spilled), (0, ['a']))
+
+    def test_rejected_item_is_spilled_and_others_written(self):
+        written, spilled = [], []
+
+        def flush(items):
+            if 'bad' in items:
+                raise IntegrityError
+            written.extend(items)
+
+        buffer = WriteBehindBuffer(flush, spill=spilled.extend)
+        buffer._items = [(item, 0) for item in ('a', 'bad', 'b')]
+        with self.assertLogs(buffers.logger, 'ERROR'):
+            self.assertEqual(buffer.flush(), 2)
+        self.assertEqual((written, spilled), (['a', 'b'], ['bad']))
+
+    def test_close_backs_off_then_spills(self):
+        spilled = []
+        flush = mock.Mock(side_effect=OperationalError)
+        buffer = WriteBehindBuffer(flush, spill=spilled.extend, close_timeout=0.5)
+        buffer._items = [('a', 0)]
+        with mock.patch.object(buffers.time, 'sleep') as sleep, \
+                mock.patch.object(buffers.time, 'monotonic', side_effect=[0, 0.1, 0.3, 0.7]), \
+                self.assertLogs(buffers.logger, 'ERROR'):
+            buffer.close()
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [0.1, 0.2])
+        self.assertEqual(flush.call_count, 3)
+        self.assertEqual(spilled, ['a'])
+
+
+@override_settings(RESPONSE_INGESTION_MODE='buffered')
+class BufferedIngestionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        self.question, self.choice = make_question()
+        self.snapshot = question_cache.ActiveQuestionSnapshot(1, self.question.pk, {}, {self.choice.pk: True})
+
+    def response(self, user=None):
+        return UserResponse(user_id=(user or self.user).pk, question_id=self.question.pk,
+                            selected_choice_id=self.choice.pk, is_correct=True)
+
+    def test_duplicate_is_rejected_across_workers(self):
+        # دو پروسه وب با صف جداگانه و کش مشترک؛ صف‌ها در تست چیزی نمی‌نویسند
+        with mock.patch.object(ingestion, 'resolve_choice', return_value=(self.snapshot, self.choice.pk, True)), \
+                mock.patch.object(WriteBehindBuffer, 'add') as add:
+            first, second = ingestion.ResponseBuffer(10, 60), ingestion.ResponseBuffer(10, 60)
+            self.assertTrue(first.submit(self.user, self.choice.pk))
+            with self.assertRaisesMessage(SubmissionError, ALREADY_ANSWERED):
+                second.submit(self.user, self.choice.pk)
+        add.assert_called_once()
+
+    def test_flush_counts_only_inserted_rows(self):
+        other = make_user('09120000001')
+        insert_responses = ingestion.insert_responses
+
+        def racing_insert(responses):
+            # پروسه دیگری بعد از پیش‌بررسی flush_responses همان پاسخ را درج کرده است
+            UserResponse.objects.bulk_create([self.response()])
+            return insert_responses(responses)
+
+        with mock.patch.object(ingestion, 'insert_responses', racing_insert):
+            ingestion.flush_responses([self.response(), self.response(other)])
+        self.assertEqual(UserResponse.objects.filter(question=self.question).count(), 2)
+        self.assertFalse(UserScore.objects.filter(user=self.user).exists())
+        self.assertEqual(UserScore.objects.get(user=other).correct_count, 1)
+        self.assertEqual(stats.question_stats(self.question.pk)['choices'][0]['total'], 1)
+
+    def test_spooled_responses_are_replayed(self):
+        with override_settings(RESPONSE_SPOOL_DIR=Path(self.enterContext(tempfile.TemporaryDirectory()))):
+            with self.assertLogs(ingestion.logger, 'ERROR'):
+                ingestion.spool_responses([self.response()])
+            self.assertEqual(ingestion.replay_spooled_responses(), 1)
+            self.assertEqual(ingestion.replay_spooled_responses(), 0)
+        self.assertTrue(UserResponse.objects.filter(user=self.user, question=self.question, is_correct=True).exists())
+        self.assertEqual(UserScore.objects.get(user=self.user).correct_count, 1)
+
+
+@override_settings(TICKET_EVENTS_POLL_INTERVAL=0.05)
+class TicketReplyWaitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        self.ticket = Ticket.objects.create(user=self.user, subject='موضوع', body='متن')
+
+    async def test_reply_in_another_process_wakes_waiter(self):
+        waiter = asyncio.ensure_future(ticket_events.wait_for_reply(self.ticket.pk, 0, timeout=5))
+        await asyncio.sleep(0.1)
+        # پروسه دیگر: فقط کش مشترک به‌روز می‌شود و broker این پروسه پیامی دریافت نمی‌کند
+        await cache.aset(ticket_events.state_key(self.ticket.pk), {'owner': self.user.pk, 'last_reply': 7})
+        await sync_to_async(ticket_events.record_reply_event)(self.ticket.pk, 7)
+        state = await asyncio.wait_for(waiter, 1)
+        self.assertEqual(state['last_reply'], 7)
+
+    async def test_idle_waiter_does_not_poll_ticket_state(self):
+        # هم‌گام کردن relay با دفتر کش (ممکن است relay تست قبلی روی همین event loop مانده باشد)
+        await ticket_events.get_relay().poll()
+        with mock.patch.object(ticket_events, 'aget_state', wraps=ticket_events.aget_state) as aget_state, \
+                mock.patch.object(ticket_events, '_aload_state', return_value={'owner': self.user.pk, 'last_reply': None}):
+            await ticket_events.wait_for_reply(self.ticket.pk, 0, timeout=0.3)
+        self.assertEqual(aget_state.call_count, 1)
+
+
+@override_settings(SMS_MAX_ATTEMPTS=2, SMS_RETRY_BACKOFF=5, SMS_DEDUP_WINDOW=60)
+class SMSQueueTests(TestCase):
+    def make_due(self):
+        # گذشتن زمان تا تلاش بعدی
+        OutboundSMS.objects.update(next_attempt_at=timezone.now())
+
+    def test_sent_message_body_is_cleared(self):
+        gateway = sms.FakeGateway()
+        sms.enqueue('09120000000', 'کد تأیید شما: 1234')
+        self.assertEqual(sms.process_batch(gateway), 1)
+        self.assertEqual(gateway.outbox, [('09120000000', 'کد تأیید شما: 1234')])
+        message = OutboundSMS.objects.get()
+        self.assertEqual((message.status, message.attempts, message.body), ('sent', 1, ''))
+        self.assertEqual(sms.process_batch(gateway), 0)
+
+    def test_failure_is_retried_with_backoff_then_failed(self):
+        gateway = sms.FakeGateway(failing_numbers={'09120000000'})
+        sms.enqueue('09120000000', 'کد تأیید شما: 1234')
+        before = timezone.now()
+        self.assertEqual(sms.process_batch(gateway), 1)
+        message = OutboundSMS.objects.get()
+        self.assertEqual((message.status, message.attempts, message.body), ('pending', 1, 'کد تأیید شما: 1234'))
+        self.assertGreaterEqual(message.next_attempt_at, before + timedelta(seconds=5))
+        # تا رسیدن زمان تلاش بعدی برداشته نمی‌شود
+        self.assertEqual(sms.process_batch(gateway), 0)
+
+        self.make_due()
+        before = timezone.now()
+        self.assertEqual(sms.process_batch(gateway), 1)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts, message.body), ('failed', 2, ''))
+        self.assertEqual(message.last_error, 'fake gateway failure')
+        self.assertGreaterEqual(message.next_attempt_at, before + timedelta(seconds=10))
+        self.make_due()
+        self.assertEqual(sms.process_batch(gateway), 0)
+        self.assertEqual(gateway.outbox, [])
+
+    def test_dedup_window(self):
+        gateway = sms.FakeGateway(failing_numbers={'09120000001'})
+        sms.enqueue('09120000000', 'کد')
+        sms.enqueue('09120000001', 'کد')
+        self.assertTrue(sms.recently_queued('09120000000'))
+        with override_settings(SMS_MAX_ATTEMPTS=1):
+            sms.process_batch(gateway)
+        # پیام ارسال‌شده تا پایان بازه مانع پیام جدید است ولی پیام ناموفق نه
+        self.assertTrue(sms.recently_queued('09120000000'))
+        self.assertFalse(sms.recently_queued('09120000001'))
+        OutboundSMS.objects.update(created_at=timezone.now() - timedelta(seconds=61))
+        self.assertFalse(sms.recently_queued('09120000000'))
+
+    def test_purge_finished(self):
+        sms.enqueue('09120000000', 'کد')
+        sms.process_batch(sms.FakeGateway())
+        sms.enqueue('09120000001', 'کد')
+        OutboundSMS.objects.update(created_at=timezone.now() - timedelta(days=8))
+        self.assertEqual(sms.purge_finished(), 1)
+        self.assertEqual(list(OutboundSMS.objects.values_list('status', flat=True)), ['pending'])
+
+
+class TicketListTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = APIClient()
+        token = issue_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+        # بارگذاری لیست ابطال پیش از شمارش کوئری‌ها
+        verify_token(token)
+        for number in range(3):
+            ticket = Ticket.objects.create(user=self.user, subject=f'موضوع {number}', body='متن')
+            TicketReply.objects.create(ticket=ticket, reply_body='پاسخ')
+
+    def test_list_includes_prefetched_replies(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/tickets/')
+        results = response.json()['results']
+        self.assertEqual([len(ticket['replies']) for ticket in results], [1, 1, 1])
+        self.assertEqual([ticket['reply_count'] for ticket in results], [1, 1, 1])
+
+    def test_replies_can_be_left_out(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/tickets/?replies=0')
+        results = response.json()['results']
+        self.assertNotIn('replies', results[0])
+        self.assertEqual([ticket['reply_count'] for ticket in results], [1, 1, 1])
+
+
+class SubmitResponseTests(TransactionTestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.question, self.choice = make_question()
+        self.snapshot = question_cache.ActiveQuestionSnapshot(1, self.question.pk, {}, {self.choice.pk: True})
+
+    def submit(self):
+        # صف bitmap در تست نوشته نمی‌شود
+        with mock.patch.object(submission, 'get_active_question', return_value=self.snapshot), \
+                mock.patch.object(bitmap, 'mark_correct'):
+            return submission.submit_response(self.user, self.choice.pk)
+
+    def test_second_answer_is_rejected(self):
+        self.assertTrue(self.submit())
+        with self.assertRaisesMessage(SubmissionError, ALREADY_ANSWERED):
+            self.submit()
+        self.assertEqual(UserResponse.objects.count(), 1)
+
+    def test_question_deleted_after_snapshot_is_not_reported_as_answered(self):
+        self.question.delete()
+        with self.assertRaisesMessage(SubmissionError, NO_ACTIVE_QUESTION):
+            self.submit()
+        self.assertFalse(UserResponse.objects.exists())
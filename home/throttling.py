@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCounters:
+    """شمارنده‌های داخل پروسه؛ وقتی کش مشترک در دسترس نیست استفاده می‌شود"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            return {key: self._data[key][0] for key in keys if key in self._data and self._data[key][1] > now}
+
+    def incr(self, key, timeout):
+        now = time.monotonic()
+        with self._lock:
+            value, expires = self._data.get(key, (0, 0))
+            if expires <= now:
+                value = 0
+                # پاک کردن گاه‌به‌گاه کلیدهای منقضی‌شده
+                if len(self._data) > 10000:
+                    self._data = {k: v for k, v in self._data.items() if v[1] > now}
+            self._data[key] = (value + 1, now + timeout)
+
+
+class CacheCounters:
+    """
+    شمارنده‌ها در کش جداگانه throttle (THROTTLE_CACHE؛ حافظه یا Redis، نه دیتابیس)
+    با بازگشت به شمارنده‌های داخل پروسه در صورت خطا
+    """
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'THROTTLE_CACHE', 'throttle')]
+
+    def get_many(self, keys):
+        try:
+            return self.cache.get_many(keys)
+        except Exception:
+            logger.warning('throttle cache unavailable; using in-process counters', exc_info=True)
+            return self.fallback.get_many(keys)
+
+    def incr(self, key, timeout):
+        try:
+            cache = self.cache
+            if not cache.add(key, 1, timeout):
+                cache.incr(key)
+        except ValueError:
+            # کلید بین add و incr منقضی شده است
+            self.cache.set(key, 1, timeout)
+        except Exception:
+            self.fallback.incr(key, timeout)
+
+
+counters = CacheCounters(LocalCounters())
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    محدودیت نرخ با پنجره لغزان تقریبی: شمارش پنجره قبلی به نسبت زمان گذشته
+    با پنجره جاری جمع می‌شود. نرخ‌ها از DEFAULT_THROTTLE_RATES با کلید
+    '<throttle_scope ویو>.<kind>' خوانده می‌شوند.
+    """
+    kind = None
+
+    def get_key(self, request):
+        """شناسه محدودیت (مثلاً IP یا شماره موبایل)؛ None یعنی محدودیتی اعمال نشود"""
+        raise NotImplementedError
+
+    def parse_rate(self, rate):
+        num, period = rate.split('/')
+        duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+        return int(num), duration
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f"{scope}.{self.kind}")
+        key = self.get_key(request)
+        if not rate or key is None:
+            return True
+
+        num_requests, duration = self.parse_rate(rate)
+        now = time.time()
+        window, offset = divmod(now, duration)
+        current_key = f"throttle:{scope}.{self.kind}:{key}:{int(window)}"
+        previous_key = f"throttle:{scope}.{self.kind}:{key}:{int(window) - 1}"
+
+        counts = counters.get_many([current_key, previous_key])
+        weight = 1 - offset / duration
+        estimated = counts.get(previous_key, 0) * weight + counts.get(current_key, 0)
+        if estimated >= num_requests:
+            self._wait = duration - offset
+            return False
+
+        counters.incr(current_key, duration * 2)
+        return True
+
+    def wait(self):
+        return getattr(self, '_wait', None)
+
+
+class IPRateThrottle(SlidingWindowThrottle):
+    kind = 'ip'
+
+    def get_key(self, request):
+        return self.get_ident(request)
+
+
+class PhoneRateThrottle(SlidingWindowThrottle):
+    kind = 'phone'
+
+    def get_key(self, request):
+        phone_number = request.data.get('phone_number')
+        return str(phone_number)[:15] if phone_number else None
+
+
+class TokenRateThrottle(SlidingWindowThrottle):
+    """محدودیت بر اساس توکن هدر Authorization؛ بدون نیاز به احراز هویت و کوئری دیتابیس"""
+    kind = 'token'
+
+    def get_key(self, request):
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        if not authorization:
+            return None
+        return hashlib.sha256(authorization.encode()).hexdigest()[:32]
+
+
+class ThrottleFirstMixin:
+    """بررسی محدودیت نرخ پیش از احراز هویت تا درخواست‌های ردشده هیچ کار دیتابیسی انجام ندهند"""
+
+    def initial(self, request, *args, **kwargs):
+        self.check_throttles(request)
+        super().initial(request, *args, **kwargs)
+
+    def check_throttles(self, request):
+        # APIView.initial دوباره check_throttles را صدا می‌زند؛ شمارش نباید دو بار انجام شود
+        if getattr(self, '_throttles_checked', False):
+            return
+        self._throttles_checked = True
+        super().check_throttles(request)
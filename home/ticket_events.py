@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import weakref
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Ticket
+from .pubsub import broker
+
+logger = logging.getLogger(__name__)
+
+# وضعیت هر تیکت در کش مشترک: صاحب تیکت و آیدی آخرین پاسخ
+STATE_KEY = 'home:ticket:{}:state'
+# دفتر رویدادهای پاسخ برای پروسه‌های دیگر: شماره آخرین رویداد و (تیکت، پاسخ) هر شماره
+EVENTS_SEQ_KEY = 'home:ticket:events:seq'
+EVENT_KEY = 'home:ticket:events:{}'
+# اگر بیش از این تعداد رویداد از دست رفته باشد همه منتظران دوباره بررسی می‌کنند
+MAX_EVENTS_PER_POLL = 1000
+
+
+def state_key(ticket_id):
+    return STATE_KEY.format(ticket_id)
+
+
+def channel(ticket_id):
+    return f"ticket:{ticket_id}"
+
+
+def state_ttl():
+    return getattr(settings, 'TICKET_STATE_TTL', 5 * 60)
+
+
+def record_reply_event(ticket_id, reply_id):
+    """ثبت رویداد پاسخ در دفتر کش مشترک تا relay پروسه‌های دیگر منتظران خود را بیدار کند"""
+    cache.add(EVENTS_SEQ_KEY, 0, None)
+    seq = cache.incr(EVENTS_SEQ_KEY)
+    cache.set(EVENT_KEY.format(seq), (ticket_id, reply_id), getattr(settings, 'TICKET_EVENTS_TTL', 60))
+
+
+def notify_reply(ticket_id, owner_id, reply_id):
+    """اعلام پاسخ جدید به منتظران همین پروسه و (از طریق کش) پروسه‌های دیگر"""
+    cache.set(state_key(ticket_id), {'owner': owner_id, 'last_reply': reply_id}, state_ttl())
+    broker.publish(channel(ticket_id), reply_id)
+    record_reply_event(ticket_id, reply_id)
+
+
+def schedule_notify_reply(ticket_id, owner_id, reply_id):
+    transaction.on_commit(lambda: notify_reply(ticket_id, owner_id, reply_id))
+
+
+async def _aload_state(ticket_id):
+    row = await Ticket.objects.filter(pk=ticket_id).annotate(
+        last_reply=Max('replies__id')
+    ).values_list('user_id', 'last_reply').afirst()
+    if row is None:
+        return None
+    return {'owner': row[0], 'last_reply': row[1]}
+
+
+async def aget_state(ticket_id):
+    """وضعیت تیکت از کش؛ فقط در صورت نبودن در کش یک کوئری اجرا می‌شود. تیکت ناموجود: None"""
+    state = await cache.aget(state_key(ticket_id))
+    if state is not None:
+        return state
+    state = await _aload_state(ticket_id)
+    if state is None:
+        return None
+    # add: اگر همزمان پاسخی ثبت شده باشد مقدار تازه‌تر آن حفظ می‌شود
+    await cache.aadd(state_key(ticket_id), state, state_ttl())
+    return await cache.aget(state_key(ticket_id)) or state
+
+
+class TicketReplyRelay:
+    """
+    یک relay برای هر event loop: هر TICKET_EVENTS_POLL_INTERVAL ثانیه فقط شماره آخرین رویداد دفتر کش
+    را می‌خواند (مستقل از تعداد منتظران) و پاسخ‌های ثبت‌شده در پروسه‌های دیگر را روی کانال
+    تیکت‌هایی که در این پروسه منتظر دارند منتشر می‌کند.
+    """
+
+    def __init__(self):
+        self.seq = None
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def poll(self):
+        seq = await cache.aget(EVENTS_SEQ_KEY) or 0
+        if self.seq is None or seq == self.seq:
+            self.seq = seq
+            return
+        events = {}
+        if self.seq < seq <= self.seq + MAX_EVENTS_PER_POLL:
+            keys = [EVENT_KEY.format(number) for number in range(self.seq + 1, seq + 1)]
+            events = await cache.aget_many(keys)
+            complete = len(events) == len(keys)
+        else:
+            # کش خالی شده یا رویدادهای زیادی از دست رفته است
+            complete = False
+        self.seq = seq
+        if not complete:
+            # بعضی رویدادها خوانده نشدند؛ همه منتظران وضعیت خود را از کش دوباره می‌خوانند
+            for name in broker.channels(prefix='ticket:'):
+                broker.publish(name, None)
+            return
+        for ticket_id, reply_id in events.values():
+            if broker.subscriber_count(channel(ticket_id)):
+                broker.publish(channel(ticket_id), reply_id)
+
+    async def run(self):
+        interval = getattr(settings, 'TICKET_EVENTS_POLL_INTERVAL', 1.0)
+        while True:
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception('ticket reply relay poll failed')
+            await asyncio.sleep(interval)
+
+
+_relays = weakref.WeakKeyDictionary()
+
+
+def get_relay():
+    loop = asyncio.get_running_loop()
+    relay = _relays.get(loop)
+    if relay is None or relay.task.done():
+        relay = _relays[loop] = TicketReplyRelay()
+    return relay
+
+
+async def wait_for_reply(ticket_id, since, timeout):
+    """
+    انتظار تا ثبت پاسخی با آیدی بزرگ‌تر از since یا تمام شدن timeout؛ خروجی وضعیت تیکت.
+    منتظر بدون polling روی کانال pub/sub تیکت می‌ماند؛ پاسخ‌های پروسه‌های دیگر را TicketReplyRelay
+    روی همین کانال منتشر می‌کند و فقط با هر پیام وضعیت از کش خوانده می‌شود.
+    در پایان timeout وضعیت یک بار از دیتابیس خوانده می‌شود تا پاسخ‌هایی که از مسیری بدون
+    notify_reply ثبت شده‌اند (یا کش قدیمی) باعث گزارش «بدون تغییر» نشوند.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    get_relay()
+    subscription = broker.subscribe(channel(ticket_id))
+    try:
+        while True:
+            state = await aget_state(ticket_id)
+            if state is None or (state['last_reply'] or 0) > since:
+                return state
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            await subscription.get(timeout=remaining)
+            if loop.time() >= deadline:
+                # بعد از timeout وضعیت فقط یک بار و از دیتابیس خوانده می‌شود
+                break
+    finally:
+        subscription.close()
+
+    fresh = await _aload_state(ticket_id)
+    if fresh is not None and fresh != state:
+        await cache.aset(state_key(ticket_id), fresh, state_ttl())
+    return fresh
@@ -0,0 +1,82 @@
+import re
+
+from django.core import checks
+from django.db import connection, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# ایندکس متن کامل تیکت‌ها (موضوع، متن و پاسخ‌ها) در مایگریشن 0014 با trigger ساخته و به‌روز می‌شود
+# SQLite: جدول FTS5 به نام home_ticket_fts، PostgreSQL: جدول home_ticket_search با ستون tsvector و ایندکس GIN
+SEARCH_SQL = {
+    'sqlite': 'SELECT ticket_id FROM home_ticket_fts WHERE home_ticket_fts MATCH %s',
+    'postgresql': "SELECT ticket_id FROM home_ticket_search WHERE document @@ to_tsquery('simple', %s)",
+}
+
+# triggerهایی که ایندکس را به‌روز نگه می‌دارند. SQLite در بازسازی جدول (مثلاً AlterField روی home_ticket)
+# triggerهای آن را بی‌صدا حذف می‌کند؛ check_search_triggers نبود آن‌ها را گزارش می‌دهد.
+SEARCH_TRIGGERS = {
+    'sqlite': (
+        'home_ticket_fts_ai', 'home_ticket_fts_au', 'home_ticket_fts_ad',
+        'home_ticketreply_fts_ai', 'home_ticketreply_fts_au', 'home_ticketreply_fts_ad',
+    ),
+    'postgresql': ('home_ticket_search_ticket', 'home_ticket_search_reply'),
+}
+SEARCH_TABLES = {'sqlite': 'home_ticket_fts', 'postgresql': 'home_ticket_search'}
+TRIGGERS_SQL = {
+    'sqlite': "SELECT name FROM sqlite_master WHERE type = 'trigger'",
+    'postgresql': 'SELECT tgname FROM pg_trigger WHERE NOT tgisinternal',
+}
+
+_TERM = re.compile(r'\w+')
+
+
+def terms(query):
+    return _TERM.findall(query or '')
+
+
+def build_query(words, vendor):
+    """عبارت جستجو برای موتور متن کامل؛ هر کلمه به صورت پیشوندی و همه کلمات با AND"""
+    if vendor == 'sqlite':
+        return ' '.join(f'"{word}"*' for word in words)
+    return ' & '.join(f"'{word}':*" for word in words)
+
+
+def search_tickets(queryset, query):
+    """فیلتر تیکت‌ها با جستجوی متن کامل روی موضوع، متن و پاسخ‌های تیکت"""
+    words = terms(query)
+    if not words:
+        return queryset.none()
+    vendor = connection.vendor
+    if vendor not in SEARCH_SQL:
+        # دیتابیس بدون ایندکس متن کامل
+        condition = Q()
+        for word in words:
+            condition &= Q(subject__icontains=word) | Q(body__icontains=word) | Q(replies__reply_body__icontains=word)
+        return queryset.filter(condition).distinct()
+    return queryset.filter(pk__in=RawSQL(SEARCH_SQL[vendor], [build_query(words, vendor)]))
+
+
+@checks.register(checks.Tags.database)
+def check_search_triggers(app_configs=None, databases=None, **kwargs):
+    """
+    هشدار برای triggerهای حذف‌شده ایندکس متن کامل (با migrate و check --database اجرا می‌شود).
+    تا اجرا نشدن مایگریشن 0014 (نبود جدول ایندکس) چیزی گزارش نمی‌شود.
+    """
+    warnings = []
+    for alias in databases or ():
+        conn = connections[alias]
+        if conn.vendor not in SEARCH_TRIGGERS:
+            continue
+        with conn.cursor() as cursor:
+            if SEARCH_TABLES[conn.vendor] not in conn.introspection.table_names(cursor):
+                continue
+            cursor.execute(TRIGGERS_SQL[conn.vendor])
+            existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in SEARCH_TRIGGERS[conn.vendor] if name not in existing]
+        if missing:
+            warnings.append(checks.Warning(
+                f"triggerهای ایندکس جستجوی تیکت در دیتابیس {alias} وجود ندارند: {', '.join(missing)}",
+                hint='ایندکس دیگر به‌روز نمی‌شود؛ برای ساخت دوباره: migrate home 0013 و سپس migrate home',
+                id='home.W001',
+            ))
+    return warnings
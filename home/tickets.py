@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Ticket, TicketReply
+from .ticket_events import schedule_notify_reply
+
+
+def create_replies(replies, admin=None):
+    """
+    ثبت دسته‌ای پاسخ‌ها با یک bulk_create و تغییر وضعیت همه تیکت‌های مربوط با یک UPDATE.
+    خروجی: پاسخ‌های ثبت‌شده
+    """
+    if not replies:
+        return []
+    for reply in replies:
+        if reply.admin_id is None:
+            reply.admin = admin
+    ticket_ids = {reply.ticket_id for reply in replies}
+    with transaction.atomic():
+        owners = dict(Ticket.objects.filter(pk__in=ticket_ids).values_list('id', 'user_id'))
+        replies = TicketReply.objects.bulk_create([reply for reply in replies if reply.ticket_id in owners])
+        # update از auto_now عبور نمی‌کند؛ updated_at دستی تنظیم می‌شود
+        Ticket.objects.filter(pk__in=owners).exclude(status='replied').update(
+            status='replied', updated_at=timezone.now()
+        )
+        for reply in replies:
+            schedule_notify_reply(reply.ticket_id, owners[reply.ticket_id], reply.pk)
+    return replies
+
+
+def bulk_reply(ticket_ids, reply_body, admin):
+    """ثبت یک پاسخ یکسان برای چند تیکت؛ تیکت‌های ناموجود نادیده گرفته می‌شوند"""
+    return create_replies(
+        [TicketReply(ticket_id=ticket_id, reply_body=reply_body) for ticket_id in dict.fromkeys(ticket_ids)],
+        admin,
+    )
@@ -0,0 +1,29 @@
+from contextlib import contextmanager
+
+from django.db import IntegrityError, OperationalError, connection, transaction
+
+
+@contextmanager
+def snapshot_atomic():
+    """
+    تراکنشی که همه کوئری‌هایش یک snapshot از دیتابیس را می‌بینند.
+    در PostgreSQL سطح REPEATABLE READ تنظیم می‌شود (در READ COMMITTED هر کوئری snapshot جدا دارد)؛
+    SQLite نوشتن‌ها را سریالی می‌کند. تغییر همزمان ردیف‌هایی که تراکنش می‌نویسد باعث خطای
+    serialization می‌شود و تراکنش باید با retry_on_conflict دوباره اجرا شود.
+    """
+    set_level = connection.vendor == 'postgresql' and not connection.in_atomic_block
+    with transaction.atomic():
+        if set_level:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        yield
+
+
+def retry_on_conflict(func, *args, attempts=5):
+    """اجرای دوباره func در صورت تداخل با تراکنش همزمان (serialization، قفل یا یکتایی)"""
+    for attempt in range(attempts):
+        try:
+            return func(*args)
+        except (IntegrityError, OperationalError):
+            if attempt == attempts - 1:
+                raise
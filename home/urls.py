@@ -3,6 +3,10 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from .views import *
+from .async_views import (
+    AsyncActiveQuestionView, AsyncCorrectRespondersView, AsyncLoginView, AsyncSignUpView, AsyncSubmitResponseView,
+    QuestionEventsView, TicketReplyWaitView,
+)
 
 app_name = 'api'
 
@@ -26,7 +30,20 @@ urlpatterns = [
     path('active-question/', ActiveQuestionView.as_view(), name='active-question'),
     path('submit-response/', SubmitResponseView.as_view(), name='submit-response'),
     path('correct-responders/', CorrectRespondersView.as_view(), name='correct-responders'),
+    # نسخه‌های async برای اجرا زیر ASGI (uvicorn gerhgosha.asgi:application)
+    path('async/login/', AsyncLoginView.as_view(), name='async-login'),
+    path('async/signup/', AsyncSignUpView.as_view(), name='async-signup'),
+    path('async/active-question/', AsyncActiveQuestionView.as_view(), name='async-active-question'),
+    path('async/submit-response/', AsyncSubmitResponseView.as_view(), name='async-submit-response'),
+    path('async/correct-responders/', AsyncCorrectRespondersView.as_view(), name='async-correct-responders'),
+    path('async/question-events/', QuestionEventsView.as_view(), name='question-events'),  # SSE
+    path('async/tickets/<int:pk>/wait/', TicketReplyWaitView.as_view(), name='ticket_reply_wait'),  # long-poll
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('questions/<int:pk>/stats/', QuestionStatsView.as_view(), name='question_stats'),
+    path('metrics/hashing/', HashingMetricsView.as_view(), name='hashing_metrics'),
     path('tickets/', TicketCreateView.as_view(), name='ticket_create_list'),  # ساخت و مشاهده لیست تیکت‌ها
+    path('tickets/search/', TicketSearchView.as_view(), name='ticket_search'),  # جستجوی متن کامل (مدیران)
+    path('tickets/bulk-reply/', BulkTicketReplyView.as_view(), name='ticket_bulk_reply'),
     path('tickets/<int:pk>/', TicketDetailView.as_view(), name='ticket_detail'),  # جزئیات تیکت
     path('tickets/<int:pk>/reply/', TicketReplyView.as_view(), name='ticket_reply'),
     path('contact-info/', ContactInfoView.as_view(), name='contact-info'),
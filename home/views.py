@@ -1,34 +1,60 @@
-from django.contrib.auth import authenticate
-from django.http import Http404
-from rest_framework import generics, status, permissions, viewsets
+import json
+
+from django.db import transaction
+from django.db.models import Count, Prefetch
+from django.http import Http404, StreamingHttpResponse
+from rest_framework import generics, status, permissions, serializers, viewsets
 from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework.authtoken.models import Token
 from .models import *
 from .serializers import *
+from .question_cache import get_active_question
+from . import hashing, leaderboard, sms, tickets
+from .authentication import issue_token
+from .ingestion import ingest_response
+from .otp import get_otp_store
+from .pagination import TicketCursorPagination
+from .stats import question_stats
+from .submission import SubmissionError
+from .ticket_search import search_tickets
+from .throttling import IPRateThrottle, PhoneRateThrottle, ThrottleFirstMixin, TokenRateThrottle
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 
-class RequestOTPView(generics.GenericAPIView):
+def hashing_busy_response():
+    # صف هش رمز عبور پر است؛ به جای انتظار طولانی، درخواست رد می‌شود
+    response = Response({'error': 'سرور مشغول است، لطفاً چند لحظه دیگر دوباره تلاش کنید.'},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = '1'
+    return response
+
+
+class RequestOTPView(ThrottleFirstMixin, generics.GenericAPIView):
     """
     ارسال کد تأیید به شماره موبایل
     """
     serializer_class = OTPSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [PhoneRateThrottle, IPRateThrottle]
+    throttle_scope = 'send_otp'
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
         phone_number = serializer.validated_data['phone_number']
-        otp_entry, created = PhoneOTP.objects.get_or_create(phone_number=phone_number)
-        otp_entry.generate_otp()
 
-        # چاپ کد تأیید در ترمینال (به جای ارسال پیامک)
-        print(f"کد تأیید برای {phone_number}: {otp_entry.otp}")
+        # کد قبلی هنوز در صف ارسال یا تازه ارسال شده است؛ کد جدیدی ساخته نمی‌شود
+        if sms.recently_queued(phone_number):
+            return Response({"message": "کد تأیید ارسال شد."}, status=status.HTTP_200_OK)
+
+        with transaction.atomic():
+            otp = get_otp_store().issue(phone_number)
+            # ارسال پیامک در worker جداگانه (manage.py run_sms_worker) انجام می‌شود
+            sms.enqueue(phone_number, f"کد تأیید شما: {otp}")
 
         return Response({"message": "کد تأیید ارسال شد."}, status=status.HTTP_200_OK)
 
@@ -44,10 +70,7 @@ class VerifyOTPView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        phone_number = serializer.validated_data['phone_number']
-        otp_entry = PhoneOTP.objects.get(phone_number=phone_number)
-        otp_entry.is_verified = True
-        otp_entry.save()
+        get_otp_store().mark_verified(serializer.validated_data['phone_number'])
 
         return Response({"message": "شماره موبایل با موفقیت تأیید شد."}, status=status.HTTP_200_OK)
 
@@ -63,29 +86,32 @@ class SignUpView(generics.CreateAPIView):
         phone_number = request.data.get('phone_number')
 
         # چک اعتبار شماره موبایل
-        otp_entry = PhoneOTP.objects.filter(phone_number=phone_number, is_verified=True).first()
-        if not otp_entry:
+        otp_store = get_otp_store()
+        if not otp_store.is_verified(phone_number):
             return Response({"error": "شماره موبایل تأیید نشده است."}, status=status.HTTP_400_BAD_REQUEST)
 
         # ثبت‌نام کاربر
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = serializer.save()
+        try:
+            user = serializer.save()
+        except hashing.HashingBusy:
+            return hashing_busy_response()
 
         # حذف OTP پس از موفقیت
-        otp_entry.delete()
+        otp_store.discard(phone_number)
 
         # ایجاد توکن برای کاربر
-        token, created = Token.objects.get_or_create(user=user)
-
         return Response({
             "user": UserSerializer(user).data,
-            "token": token.key
+            "token": issue_token(user)
         }, status=status.HTTP_201_CREATED)
 
 
-class LoginView(APIView):
+class LoginView(ThrottleFirstMixin, APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [PhoneRateThrottle, IPRateThrottle]
+    throttle_scope = 'login'
 
     @swagger_auto_schema(
         operation_description="ورود کاربر با شماره موبایل و رمز عبور",
@@ -106,14 +132,16 @@ class LoginView(APIView):
         if not phone_number or not password:
             return Response({'error': 'شماره موبایل و رمز عبور الزامی هستند.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        user = authenticate(phone_number=phone_number, password=password)
+        try:
+            user = hashing.authenticate_user(phone_number, password)
+        except hashing.HashingBusy:
+            return hashing_busy_response()
         if user is None:
             return Response({'error': 'نام کاربری یا رمز عبور اشتباه است.'}, status=status.HTTP_401_UNAUTHORIZED)
 
-        token, created = Token.objects.get_or_create(user=user)
         return Response({
             "user": UserSerializer(user).data,
-            "token": token.key
+            "token": issue_token(user)
         }, status=status.HTTP_200_OK)
 
 
@@ -121,15 +149,18 @@ class ActiveQuestionView(generics.RetrieveAPIView):
     """نمایش سوال فعال"""
     serializer_class = QuestionSerializer
 
-    def get_object(self):
-        question = Question.objects.filter(is_active=True).first()
-        if not question:
+    def retrieve(self, request, *args, **kwargs):
+        # پاسخ از snapshot داخل حافظه خوانده می‌شود و سریالایزر دوباره اجرا نمی‌شود
+        snapshot = get_active_question()
+        if snapshot.data is None:
             raise Http404("سوال فعالی یافت نشد.")
-        return question
+        return Response(snapshot.data)
 
 
-class SubmitResponseView(APIView):
+class SubmitResponseView(ThrottleFirstMixin, APIView):
     permission_classes = [IsAuthenticated]  # کاربران باید حتما احراز هویت شوند
+    throttle_classes = [TokenRateThrottle, IPRateThrottle]
+    throttle_scope = 'submit_response'
 
     @swagger_auto_schema(
         operation_description="ثبت پاسخ کاربر برای سوال فعال",
@@ -150,71 +181,195 @@ class SubmitResponseView(APIView):
         if not request.user.is_authenticated:
             return Response({'error': 'احراز هویت لازم است.'}, status=status.HTTP_401_UNAUTHORIZED)
 
-        selected_choice_id = request.data.get('selected_choice_id')
+        try:
+            is_correct = ingest_response(request.user, request.data.get('selected_choice_id'))
+        except SubmissionError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
 
-        question = Question.objects.filter(is_active=True).first()
-        if not question:
-            return Response({'error': 'هیچ سوال فعالی وجود ندارد.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'message': 'پاسخ شما ثبت شد.',
+            'is_correct': is_correct
+        }, status=status.HTTP_201_CREATED)
 
-        if UserResponse.objects.filter(user=request.user, question=question).exists():
-            return Response({'error': 'شما قبلاً به این سوال پاسخ داده‌اید.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        selected_choice = Choice.objects.filter(id=selected_choice_id, question=question).first()
-        if not selected_choice:
-            return Response({'error': 'گزینه انتخاب شده معتبر نیست.'}, status=status.HTTP_400_BAD_REQUEST)
+CORRECT_RESPONDER_FIELDS = ('user_id', 'user__phone_number', 'user__first_name', 'user__last_name', 'user__province', 'user__gender')
+GENDER_DISPLAY = dict(User.GENDER_CHOICES)
 
-        user_response = UserResponse.objects.create(
-            user=request.user,
-            question=question,
-            selected_choice=selected_choice,
-            is_correct=selected_choice.is_correct
-        )
 
-        if selected_choice.is_correct:
-            question.correct_responders.add(request.user)
+def correct_responder_row(row):
+    user_id, phone_number, first_name, last_name, province, gender = row
+    return {
+        'id': user_id,
+        'phone_number': phone_number,
+        'first_name': first_name,
+        'last_name': last_name,
+        'province': province,
+        'gender': GENDER_DISPLAY.get(gender, gender),
+    }
 
-        return Response({
-            'message': 'پاسخ شما ثبت شد.',
-            'is_correct': selected_choice.is_correct
-        }, status=status.HTTP_201_CREATED)
+
+def stream_correct_responders(rows, chunk_size=500):
+    """نوشتن تکه‌تکه JSON همزمان با خواندن ردیف‌ها از دیتابیس"""
+    yield '{"correct_responders": ['
+    separator = ''
+    chunk = []
+    for row in rows:
+        chunk.append(separator + json.dumps(correct_responder_row(row), ensure_ascii=False))
+        separator = ','
+        if len(chunk) >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+    yield ']}'
 
 
 class CorrectRespondersView(APIView):
-    """لیست کاربران با پاسخ صحیح به سوال فعال"""
+    """
+    لیست کاربران با پاسخ صحیح به سوال فعال
+    صفحه‌بندی keyset روی آیدی کاربر: ?cursor=<آیدی آخرین کاربر>&limit=<تعداد>
+    با ?stream=1 کل لیست به صورت جریانی ارسال می‌شود.
+    """
     permission_classes = [AllowAny]
+    default_limit = 100
+    max_limit = 1000
 
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, description='آیدی آخرین کاربر صفحه قبل', type=openapi.TYPE_INTEGER),
+            openapi.Parameter('limit', openapi.IN_QUERY, description='تعداد کاربران هر صفحه', type=openapi.TYPE_INTEGER),
+            openapi.Parameter('stream', openapi.IN_QUERY, description='ارسال جریانی کل لیست', type=openapi.TYPE_BOOLEAN),
+        ]
+    )
     def get(self, request):
-        question = Question.objects.filter(is_active=True).first()
-        if not question:
+        question_id = get_active_question().question_id
+        if question_id is None:
             return Response({'error': 'هیچ سوال فعالی وجود ندارد.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        correct_responders = question.correct_responders.all()
-        correct_responders_data = [
-            {
-                'phone_number': user.phone_number,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'province': user.province,
-                'gender': user.get_gender_display(),
-            }
-            for user in correct_responders
+        try:
+            cursor = int(request.query_params.get('cursor', 0))
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return Response({'error': 'پارامتر cursor یا limit معتبر نیست.'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.max_limit))
+
+        # مرتب‌سازی روی ایندکس یکتای (question_id, user_id) جدول واسط
+        rows = Question.correct_responders.through.objects.filter(
+            question_id=question_id, user_id__gt=cursor
+        ).order_by('user_id').values_list(*CORRECT_RESPONDER_FIELDS)
+
+        if request.query_params.get('stream') in ('1', 'true'):
+            return StreamingHttpResponse(
+                stream_correct_responders(rows.iterator(chunk_size=2000)),
+                content_type='application/json',
+            )
+
+        page = [correct_responder_row(row) for row in rows[:limit + 1]]
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = page[-1]['id']
+
+        return Response({'correct_responders': page, 'next_cursor': next_cursor}, status=status.HTTP_200_OK)
+
+
+class LeaderboardView(APIView):
+    """
+    جدول رتبه‌بندی کاربران بر اساس تعداد پاسخ‌های درست
+    با ?province=<استان> یا ?gender=<M|F> محدود می‌شود.
+    """
+    permission_classes = [AllowAny]
+    default_limit = 10
+    max_limit = 100
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('province', openapi.IN_QUERY, description='استان', type=openapi.TYPE_STRING),
+            openapi.Parameter('gender', openapi.IN_QUERY, description='جنسیت (M یا F)', type=openapi.TYPE_STRING),
+            openapi.Parameter('limit', openapi.IN_QUERY, description='تعداد نفرات برتر', type=openapi.TYPE_INTEGER),
         ]
+    )
+    def get(self, request):
+        province = request.query_params.get('province')
+        gender = request.query_params.get('gender')
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return Response({'error': 'پارامتر limit معتبر نیست.'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.max_limit))
+
+        entries = UserScoreSerializer(leaderboard.top(limit, province, gender), many=True).data
+        for rank, entry in enumerate(entries, start=1):
+            entry['rank'] = rank
+        data = {'leaderboard': entries}
+
+        if request.user.is_authenticated:
+            my_rank = leaderboard.rank_of(request.user.pk, province, gender)
+            data['me'] = {'rank': my_rank[0], 'correct_count': my_rank[1]} if my_rank else None
 
-        return Response({'correct_responders': correct_responders_data}, status=status.HTTP_200_OK)
+        return Response(data, status=status.HTTP_200_OK)
 
 
+class QuestionStatsView(APIView):
+    """آمار پاسخ‌های یک سوال به تفکیک گزینه، استان و جنسیت"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, pk):
+        if not Question.objects.filter(pk=pk).exists():
+            raise Http404("سوال یافت نشد.")
+        return Response(question_stats(pk), status=status.HTTP_200_OK)
+
+
+class HashingMetricsView(APIView):
+    """وضعیت صف هش رمز عبور: تعداد کارهای در انتظار و زمان هش"""
+    permission_classes = [permissions.IsAdminUser]
 
-class TicketCreateView(generics.ListCreateAPIView):
+    def get(self, request):
+        return Response(hashing.metrics.snapshot(), status=status.HTTP_200_OK)
+
+
+REPLIES_PARAMETER = openapi.Parameter(
+    'replies', openapi.IN_QUERY, description='0: لیست بدون پاسخ‌های تیکت (فقط reply_count)', type=openapi.TYPE_INTEGER,
+)
+
+
+class TicketListMixin:
+    """پاسخ‌های هر صفحه با یک کوئری (prefetch) خوانده می‌شوند؛ با ?replies=0 پاسخ‌ها حذف می‌شوند"""
+
+    def include_replies(self):
+        return self.request.query_params.get('replies') not in ('0', 'false')
+
+    def get_list_serializer_class(self):
+        return TicketListSerializer if self.include_replies() else TicketSummarySerializer
+
+    def list_queryset(self, queryset):
+        queryset = queryset.annotate(reply_count=Count('replies'))
+        if self.include_replies():
+            queryset = queryset.prefetch_related(Prefetch('replies', queryset=TicketReply.objects.order_by('id')))
+        return queryset
+
+
+class TicketCreateView(TicketListMixin, generics.ListCreateAPIView):
     """
     API برای ایجاد و مشاهده لیست تیکت‌های کاربر
     """
     queryset = Ticket.objects.all()
     serializer_class = TicketSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TicketCursorPagination
+
+    @swagger_auto_schema(manual_parameters=[REPLIES_PARAMETER])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET':
+            return self.get_list_serializer_class()
+        return TicketSerializer
 
     def get_queryset(self):
         # نمایش فقط تیکت‌های کاربر لاگین‌شده
-        return Ticket.objects.filter(user=self.request.user)
+        return self.list_queryset(Ticket.objects.filter(user=self.request.user))
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -223,14 +378,30 @@ class TicketCreateView(generics.ListCreateAPIView):
 class TicketDetailView(generics.RetrieveAPIView):
     """
     نمایش جزئیات تیکت و چت‌های آن (پاسخ‌ها)
+    با ?since=<آیدی آخرین پاسخ دریافت‌شده> فقط پاسخ‌های جدیدتر برگردانده می‌شوند.
     """
     queryset = Ticket.objects.all()
     serializer_class = TicketSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('since', openapi.IN_QUERY, description='آیدی آخرین پاسخ دریافت‌شده', type=openapi.TYPE_INTEGER),
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def get_queryset(self):
+        replies = TicketReply.objects.order_by('id')
+        since = self.request.query_params.get('since')
+        if since:
+            try:
+                replies = replies.filter(id__gt=int(since))
+            except ValueError:
+                raise serializers.ValidationError({'since': 'پارامتر since معتبر نیست.'})
         # کاربران فقط به تیکت‌های خودشان دسترسی دارند
-        return Ticket.objects.filter(user=self.request.user)
+        return Ticket.objects.filter(user=self.request.user).prefetch_related(Prefetch('replies', queryset=replies))
 
 
 class TicketReplyView(generics.CreateAPIView):
@@ -246,6 +417,48 @@ class TicketReplyView(generics.CreateAPIView):
         serializer.save(ticket=ticket, admin=self.request.user)
 
 
+class TicketSearchView(TicketListMixin, generics.ListAPIView):
+    """
+    جستجوی متن کامل تیکت‌ها برای مدیران (موضوع، متن و پاسخ‌ها)
+    """
+    permission_classes = [permissions.IsAdminUser]
+    pagination_class = TicketCursorPagination
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, description='عبارت جستجو', type=openapi.TYPE_STRING, required=True),
+            REPLIES_PARAMETER,
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_serializer_class(self):
+        return self.get_list_serializer_class()
+
+    def get_queryset(self):
+        return search_tickets(self.list_queryset(Ticket.objects.all()), self.request.query_params.get('q'))
+
+
+class BulkTicketReplyView(generics.GenericAPIView):
+    """
+    پاسخ یکسان مدیر به چند تیکت با یک bulk_create و یک UPDATE وضعیت
+    """
+    serializer_class = BulkTicketReplySerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        replies = tickets.bulk_reply(
+            serializer.validated_data['ticket_ids'], serializer.validated_data['reply_body'], request.user
+        )
+        return Response({
+            'replied_ticket_ids': [reply.ticket_id for reply in replies],
+            'replies': TicketReplySerializer(replies, many=True).data,
+        }, status=status.HTTP_201_CREATED)
+
+
 class ContactInfoView(generics.RetrieveAPIView):
     serializer_class = ContactInfoSerializer
 